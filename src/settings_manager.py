@@ -7,6 +7,10 @@ import configparser
 import threading
 import logging
 import json
+import atexit
+import re
+import sqlite3
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 
@@ -165,6 +169,526 @@ class ThemeManager:
             logging.error(f"设置主题失败: {str(e)}")
             raise
 
+class HistoryStore:
+    """基于SQLite的翻译历史存储
+
+    历史记录不限条数，按时间和语言对建立索引；
+    原文和译文建立FTS5全文索引（trigram分词），搜索按子串匹配，只取最新的若干条，
+    历史记录再多也能在毫秒级返回；trigram无法索引的1~2个字符的关键词使用另一个双字索引。
+    SQLite不支持FTS5或trigram分词时退回LIKE查询。
+    每次写入后通知订阅者：listener(动作, 版本, 键, 记录)，动作为add、update、delete、clear
+    """
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL UNIQUE,
+            source_text TEXT NOT NULL,
+            target_text TEXT NOT NULL,
+            from_lang TEXT NOT NULL,
+            to_lang TEXT NOT NULL,
+            time TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_time ON history(time);
+        CREATE INDEX IF NOT EXISTS idx_history_langs ON history(from_lang, to_lang, id);
+        CREATE INDEX IF NOT EXISTS idx_history_id ON history(id);
+    '''
+    FTS_SCHEMA = '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+            source_text, target_text, content='history', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+            INSERT INTO history_fts(rowid, source_text, target_text)
+            VALUES (new.id, new.source_text, new.target_text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+            INSERT INTO history_fts(history_fts, rowid, source_text, target_text)
+            VALUES ('delete', old.id, old.source_text, old.target_text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS history_au AFTER UPDATE ON history BEGIN
+            INSERT INTO history_fts(history_fts, rowid, source_text, target_text)
+            VALUES ('delete', old.id, old.source_text, old.target_text);
+            INSERT INTO history_fts(rowid, source_text, target_text)
+            VALUES (new.id, new.source_text, new.target_text);
+        END;
+    '''
+    # 双字索引：每个位置取两个字符（末尾取一个）作为词，每个字符编码为定长的4位36进制数，
+    # 使标点和空白也能作为词的一部分。两个字符的关键词按词查询，一个字符的按前缀查询（编码定长，不会误匹配）
+    BIGRAM_SCHEMA = '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS history_bigram USING fts5(
+            source_text, target_text, content=''
+        );
+        CREATE TRIGGER IF NOT EXISTS history_bigram_ai AFTER INSERT ON history BEGIN
+            INSERT INTO history_bigram(rowid, source_text, target_text)
+            VALUES (new.id, history_bigrams(new.source_text), history_bigrams(new.target_text));
+        END;
+        CREATE TRIGGER IF NOT EXISTS history_bigram_ad AFTER DELETE ON history BEGIN
+            INSERT INTO history_bigram(history_bigram, rowid, source_text, target_text)
+            VALUES ('delete', old.id, history_bigrams(old.source_text), history_bigrams(old.target_text));
+        END;
+        CREATE TRIGGER IF NOT EXISTS history_bigram_au AFTER UPDATE ON history BEGIN
+            INSERT INTO history_bigram(history_bigram, rowid, source_text, target_text)
+            VALUES ('delete', old.id, history_bigrams(old.source_text), history_bigrams(old.target_text));
+            INSERT INTO history_bigram(rowid, source_text, target_text)
+            VALUES (new.id, history_bigrams(new.source_text), history_bigrams(new.target_text));
+        END;
+    '''
+    FIELDS = ('source_text', 'target_text', 'from_lang', 'to_lang', 'time')
+    MIN_FTS_QUERY = 3  # trigram分词下短于3个字符的关键词无法使用全文索引，改用双字索引
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        dirname = os.path.dirname(db_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        # 触发器中生成双字索引的词
+        self._conn.create_function('history_bigrams', 1, self._bigrams, deterministic=True)
+        try:
+            self._conn.executescript(self.FTS_SCHEMA)
+            self._create_bigram_index()
+            self._fts = True
+        except sqlite3.OperationalError as e:
+            logging.warning(f"SQLite不支持FTS5 trigram分词，历史搜索使用LIKE查询: {str(e)}")
+            self._fts = False
+        self._db_lock = threading.Lock()
+        self.version = 0  # 每次写入后递增，用于判断搜索结果和缓存的页是否仍然有效
+        self._listeners = []
+        atexit.register(self.close)
+
+    def subscribe(self, listener):
+        """订阅变更通知，通知在执行写入的线程中发出"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def add(self, key, record):
+        """添加一条历史记录，键已存在时更新"""
+        self.add_many([(key, record)])
+
+    def add_many(self, items):
+        """批量添加 [(键, 记录)]"""
+        events = []
+        with self._db_lock, self._conn:
+            for key, record in items:
+                exists = self._conn.execute('SELECT 1 FROM history WHERE key = ?', (key,)).fetchone()
+                self._conn.execute(
+                    'INSERT INTO history (key, source_text, target_text, from_lang, to_lang, time) '
+                    'VALUES (?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET source_text=excluded.source_text, '
+                    'target_text=excluded.target_text, from_lang=excluded.from_lang, '
+                    'to_lang=excluded.to_lang, time=excluded.time',
+                    (key,) + tuple(record[field] for field in self.FIELDS)
+                )
+                self.version += 1
+                # 更新已有的键不改变记录的位置
+                events.append(('update' if exists else 'add', self.version, key, record))
+        self._publish(events)
+
+    def load(self, limit=None):
+        """返回按时间排序的历史记录 {键: 记录}，limit为只取最新的条数"""
+        with self._db_lock:
+            rows = self._conn.execute(
+                'SELECT key, source_text, target_text, from_lang, to_lang, time '
+                'FROM history ORDER BY id DESC LIMIT ?',
+                (-1 if limit is None else limit,)
+            ).fetchall()
+        return OrderedDict((row[0], self._record(row)) for row in reversed(rows))
+
+    def search(self, text, limit=200, from_lang=None, to_lang=None):
+        """搜索原文或译文包含text的记录（不区分大小写），返回最新的limit条 [(键, 记录)]"""
+        conditions, params = [], []
+        if from_lang:
+            conditions.append('h.from_lang = ?')
+            params.append(from_lang)
+        if to_lang:
+            conditions.append('h.to_lang = ?')
+            params.append(to_lang)
+        if self._fts and len(text) >= self.MIN_FTS_QUERY:
+            # 整个关键词作为短语查询，trigram分词下即为子串匹配
+            sql = ('SELECT h.key, h.source_text, h.target_text, h.from_lang, h.to_lang, h.time '
+                   'FROM history_fts f JOIN history h ON h.id = f.rowid '
+                   'WHERE history_fts MATCH ?')
+            params.insert(0, '"' + text.replace('"', '""') + '"')
+            order = 'f.rowid'
+        elif self._fts and text:
+            gram = ''.join(self._encode_char(char) for char in text.lower())
+            sql = ('SELECT h.key, h.source_text, h.target_text, h.from_lang, h.to_lang, h.time '
+                   'FROM history_bigram b JOIN history h ON h.id = b.rowid '
+                   'WHERE history_bigram MATCH ?')
+            params.insert(0, f'"{gram}"' + ('*' if len(text) == 1 else ''))
+            order = 'b.rowid'
+        else:
+            pattern = '%' + re.sub(r'([\\%_])', r'\\\1', text) + '%'
+            sql = ('SELECT h.key, h.source_text, h.target_text, h.from_lang, h.to_lang, h.time '
+                   'FROM history h '
+                   "WHERE (h.source_text LIKE ? ESCAPE '\\' OR h.target_text LIKE ? ESCAPE '\\')")
+            params[:0] = [pattern, pattern]
+            order = 'h.id'
+        for condition in conditions:
+            sql += ' AND ' + condition
+        sql += f' ORDER BY {order} DESC LIMIT ?'
+        params.append(limit)
+        with self._db_lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [(row[0], self._record(row)) for row in rows]
+
+    def page(self, offset, limit, preview_length=None, before_key=None, after_key=None, start_id=None):
+        """按时间倒序返回记录 [(键, 记录)]
+
+        给出before_key或after_key时返回紧接在该记录之后或之前的limit条，给出start_id时返回
+        从该id的记录起的limit条，均由索引定位，与所在位置无关；否则返回从第offset条起的limit条。
+        preview_length不为空时原文和译文只读取前preview_length+1个字符，供列表预览
+        """
+        if preview_length is None:
+            columns = 'source_text, target_text'
+        else:
+            length = int(preview_length) + 1
+            columns = f'substr(source_text, 1, {length}), substr(target_text, 1, {length})'
+        sql = f'SELECT key, {columns}, from_lang, to_lang, time FROM history '
+        if before_key is not None:
+            sql += 'WHERE id < (SELECT id FROM history WHERE key = ?) ORDER BY id DESC LIMIT ?'
+            params = (before_key, limit)
+        elif after_key is not None:
+            sql += 'WHERE id > (SELECT id FROM history WHERE key = ?) ORDER BY id LIMIT ?'
+            params = (after_key, limit)
+        elif start_id is not None:
+            sql += 'WHERE id <= ? ORDER BY id DESC LIMIT ?'
+            params = (start_id, limit)
+        else:
+            sql += 'ORDER BY id DESC LIMIT ? OFFSET ?'
+            params = (limit, offset)
+        with self._db_lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if after_key is not None:
+            rows.reverse()
+        return [(row[0], self._record(row)) for row in rows]
+
+    def locate(self, offset, from_id=None):
+        """返回按时间倒序从from_id的记录（默认最新一条）起第offset条记录的id，不存在时返回None
+
+        offset为负时向更新的记录方向计数。只扫描仅含id的紧凑索引，
+        从附近的已知记录起跳过的代价远小于OFFSET逐行跳过完整记录
+        """
+        sql = 'SELECT id FROM history INDEXED BY idx_history_id '
+        if from_id is None:
+            sql += 'ORDER BY id DESC LIMIT 1 OFFSET ?'
+            params = (offset,)
+        elif offset >= 0:
+            sql += 'WHERE id <= ? ORDER BY id DESC LIMIT 1 OFFSET ?'
+            params = (from_id, offset)
+        else:
+            sql += 'WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?'
+            params = (from_id, -offset - 1)
+        with self._db_lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    def get(self, key):
+        """返回完整记录，不存在时返回None"""
+        with self._db_lock:
+            row = self._conn.execute(
+                'SELECT key, source_text, target_text, from_lang, to_lang, time FROM history WHERE key = ?',
+                (key,)
+            ).fetchone()
+        return self._record(row) if row else None
+
+    def count(self):
+        with self._db_lock:
+            return self._conn.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+
+    def delete(self, key):
+        """删除一条历史记录，返回是否存在"""
+        with self._db_lock, self._conn:
+            if not self._conn.execute('DELETE FROM history WHERE key = ?', (key,)).rowcount:
+                return False
+            self.version += 1
+            version = self.version
+        self._publish([('delete', version, key, None)])
+        return True
+
+    def clear(self):
+        """删除全部历史记录"""
+        with self._db_lock, self._conn:
+            self._conn.execute('DELETE FROM history')
+            self.version += 1
+            version = self.version
+        self._publish([('clear', version, None, None)])
+
+    def close(self):
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _create_bigram_index(self):
+        """建立双字索引，旧数据库中已有的记录补建索引"""
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'history_bigram'").fetchone()
+        self._conn.executescript(self.BIGRAM_SCHEMA)
+        if not exists:
+            with self._conn:
+                self._conn.execute(
+                    'INSERT INTO history_bigram(rowid, source_text, target_text) '
+                    'SELECT id, history_bigrams(source_text), history_bigrams(target_text) FROM history')
+
+    @staticmethod
+    def _bigrams(text):
+        """生成双字索引的词（不区分大小写），排序保证删除时生成相同的词序列"""
+        if not text:
+            return ''
+        codes = list(map(HistoryStore._encode_char, text.lower()))
+        return ' '.join(sorted({first + second for first, second in zip(codes, codes[1:] + [''])}))
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _encode_char(char):
+        """将字符编码为4位36进制数"""
+        code = ord(char)
+        digits = ''
+        for _ in range(4):
+            code, digit = divmod(code, 36)
+            digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+        return digits
+
+    def _publish(self, events):
+        for event in events:
+            for listener in list(self._listeners):
+                try:
+                    listener(*event)
+                except Exception as e:
+                    logging.error(f"处理历史记录变更通知失败: {str(e)}")
+
+    @classmethod
+    def _record(cls, row):
+        return dict(zip(cls.FIELDS, row[1:]))
+
+class HistoryPageSource:
+    """历史记录列表的分页数据源
+
+    按页从HistoryStore读取最新在前的记录预览，缓存最近使用的页；
+    列表滚动时只读取可见范围所在的页。拖动滚动条跳到远处时，从最近的已知页首id定位，
+    再按id读取整页，不使用OFFSET。新增的记录由apply()放在缓存的页之前，
+    不需要重新读取；版本不连续的变更使缓存失效
+    """
+    PAGE_SIZE = 100
+    MAX_PAGES = 20
+
+    def __init__(self, store, preview_length=100):
+        self.store = store
+        self.preview_length = preview_length
+        self._head = []  # 缓存页之后新增的记录，最新在前
+        self._pages = OrderedDict()  # 页号 -> [(键, 预览记录)]，页号不含_head中的记录
+        self._page_ids = {}  # 页号 -> 该页第一条记录的id，数量很少，不随页缓存淘汰
+        self._count = None
+        self._version = None
+
+    def count(self):
+        self._check_version()
+        if self._count is None:
+            self._count = self.store.count()
+        return self._count
+
+    def rows(self, start, stop):
+        """返回第start到stop条（不含）记录的预览 [(键, 记录)]"""
+        self._check_version()
+        rows = self._head[start:stop]
+        start = max(start - len(self._head), 0)
+        stop = max(stop - len(self._head), 0)
+        if stop <= start:
+            return rows
+        for page_number in range(start // self.PAGE_SIZE, (stop - 1) // self.PAGE_SIZE + 1):
+            page = self._pages.get(page_number)
+            if page is None:
+                page = [(key, self.preview(record, self.preview_length))
+                        for key, record in self._fetch(page_number)]
+                self._pages[page_number] = page
+                if len(self._pages) > self.MAX_PAGES:
+                    self._pages.popitem(last=False)
+            else:
+                self._pages.move_to_end(page_number)
+            offset = page_number * self.PAGE_SIZE
+            rows.extend(page[max(start - offset, 0):max(stop - offset, 0)])
+        return rows
+
+    def get(self, key):
+        """读取完整记录"""
+        return self.store.get(key)
+
+    def apply(self, action, version, key=None, record=None):
+        """应用HistoryStore的变更通知，返回新增记录的位置，其他变更返回None"""
+        if self._version is not None and version <= self._version:
+            # 读取时已包含该变更
+            return None
+        if self._version != version - 1:
+            self._version = version
+            self.invalidate()
+            return None
+        self._version = version
+        if action == 'add':
+            self._head.insert(0, (key, self.preview(record, self.preview_length)))
+            if self._count is not None:
+                self._count += 1
+            if len(self._head) > self.PAGE_SIZE:
+                self.invalidate()
+            return 0
+        if action == 'update':
+            preview = self.preview(record, self.preview_length)
+            for rows in [self._head] + list(self._pages.values()):
+                for i, (row_key, _) in enumerate(rows):
+                    if row_key == key:
+                        rows[i] = (key, preview)
+            return None
+        # 删除后各页的边界改变，重新读取
+        self.invalidate()
+        if action == 'clear':
+            self._count = 0
+        return None
+
+    def _fetch(self, page_number):
+        """读取一页；相邻页已缓存时从相邻页的边界记录定位，避免OFFSET逐行跳过前面的记录"""
+        previous = self._pages.get(page_number - 1)
+        if previous and len(previous) == self.PAGE_SIZE:
+            return self.store.page(None, self.PAGE_SIZE, self.preview_length, before_key=previous[-1][0])
+        following = self._pages.get(page_number + 1)
+        if following:
+            return self.store.page(None, self.PAGE_SIZE, self.preview_length, after_key=following[0][0])
+        page_id = self._page_id(page_number)
+        if page_id is None:
+            return []
+        return self.store.page(None, self.PAGE_SIZE, self.preview_length, start_id=page_id)
+
+    def _page_id(self, page_number):
+        """返回该页第一条记录的id，从最近的已知页首（或最新一条记录）起定位"""
+        page_id = self._page_ids.get(page_number)
+        if page_id is not None:
+            return page_id
+        from_top = page_number * self.PAGE_SIZE + len(self._head)
+        nearest = min(self._page_ids, key=lambda known: abs(known - page_number), default=None)
+        if nearest is None or from_top <= abs(nearest - page_number) * self.PAGE_SIZE:
+            page_id = self.store.locate(from_top)
+        else:
+            page_id = self.store.locate((page_number - nearest) * self.PAGE_SIZE, self._page_ids[nearest])
+        if page_id is not None:
+            self._page_ids[page_number] = page_id
+        return page_id
+
+    def invalidate(self):
+        self._head = []
+        self._pages.clear()
+        self._page_ids.clear()
+        self._count = None
+
+    @staticmethod
+    def preview(record, length):
+        """返回原文和译文截断为单行预览的记录副本"""
+        preview = dict(record)
+        for field in ('source_text', 'target_text'):
+            text = preview[field]
+            preview[field] = ' '.join(text[:length].split()) + ('…' if len(text) > length else '')
+        return preview
+
+    def _check_version(self):
+        if self._version != self.store.version:
+            self._version = self.store.version
+            self.invalidate()
+
+class HistoryListSource:
+    """由已读取的记录列表（如搜索结果）构成的数据源，接口与HistoryPageSource相同
+
+    新增记录不会加入列表，需要时由调用方重新搜索
+    """
+    def __init__(self, store, items, preview_length=100):
+        self.store = store
+        self.preview_length = preview_length
+        self._items = [(key, HistoryPageSource.preview(record, preview_length)) for key, record in items]
+
+    def count(self):
+        return len(self._items)
+
+    def rows(self, start, stop):
+        return self._items[start:stop]
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def apply(self, action, version, key=None, record=None):
+        """应用HistoryStore的变更通知，始终返回None"""
+        if action == 'clear':
+            self._items = []
+        elif action == 'delete':
+            self._items = [item for item in self._items if item[0] != key]
+        elif action == 'update':
+            preview = HistoryPageSource.preview(record, self.preview_length)
+            self._items = [(key, preview) if item[0] == key else item for item in self._items]
+        return None
+
+    def invalidate(self):
+        pass
+
+class HistorySearch:
+    """历史记录的增量搜索
+
+    保留上一次搜索的结果及其小写文本；新关键词包含上一次的关键词、上次结果完整
+    且历史记录未变化时，只在上一次的结果中过滤，否则查询全文索引。
+    每次搜索对应一个递增的代号，开始新搜索后旧搜索在检查点放弃，不再返回结果
+    """
+    CHECK_INTERVAL = 256  # 过滤多少条记录检查一次搜索是否已被取代
+
+    def __init__(self, store, limit=200):
+        self.store = store
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._query = None
+        self._version = None
+        self._results = []  # [(键, 记录, 小写原文, 小写译文)]
+        self._complete = False  # 上一次结果是否包含全部匹配记录
+
+    def next_generation(self):
+        """开始新搜索，之前的搜索全部作废"""
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    def is_current(self, generation):
+        with self._lock:
+            return generation == self._generation
+
+    def search(self, query, generation=None):
+        """返回原文或译文包含query的记录 [(键, 记录)]，搜索已被取代时返回None"""
+        if generation is None:
+            generation = self.next_generation()
+        needle = query.strip().lower()
+        version = self.store.version
+        with self._lock:
+            narrow = (self._query and self._complete and self._version == version
+                      and self._query in needle)
+            previous = self._results
+        if narrow:
+            matches = []
+            for i, entry in enumerate(previous):
+                if i % self.CHECK_INTERVAL == 0 and not self.is_current(generation):
+                    return None
+                if needle in entry[2] or needle in entry[3]:
+                    matches.append(entry)
+        else:
+            matches = [(key, record, record['source_text'].lower(), record['target_text'].lower())
+                       for key, record in self.store.search(needle, self.limit)]
+        with self._lock:
+            if generation != self._generation:
+                return None
+            self._query = needle
+            self._version = version
+            self._results = matches
+            # 过滤得到的结果是完整结果的子集，仍然完整
+            self._complete = narrow or len(matches) < self.limit
+        return [(key, record) for key, record, _, _ in matches]
+
 class SettingsManager:
     """设置管理器"""
     def __init__(self, root, config_file):
@@ -174,6 +698,13 @@ class SettingsManager:
         # 添加历史记录文件路径
         base_path = os.path.dirname(config_file)
         self.history_file = os.path.join(base_path, 'history.json')
+        # 翻译历史保存在SQLite中，首次启动时导入旧版的history.json和日志
+        self.history_store = HistoryStore(os.path.join(base_path, 'history.db'))
+        self._migrate_history()
+        # 持久化翻译缓存
+        self.cache_file = os.path.join(base_path, 'translation_cache.db')
+        # 多个程序实例共享的只读缓存快照
+        self.snapshot_file = os.path.join(base_path, 'shared_cache.snap')
     
     def save_config(self, appid, appkey):
         """保存配置"""
@@ -215,11 +746,13 @@ class SettingsManager:
         """设置主题"""
         self.theme_manager.set_theme(theme)
 
-    def save_all_config(self, appid, appkey, shortcuts, theme, source_lang=None, target_lang=None, format_type=None, export_format=None):
+    def save_all_config(self, appid, appkey, shortcuts, theme, source_lang=None, target_lang=None, format_type=None, export_format=None, api_tier=None):
         """保存所有配置"""
         try:
             config = configparser.ConfigParser()
             config['BaiduAPI'] = {'appid': appid, 'appkey': appkey}
+            if api_tier:
+                config['BaiduAPI']['tier'] = api_tier
             config['Shortcuts'] = shortcuts
             config['Theme'] = {'theme': theme}
             if source_lang and target_lang:
@@ -261,6 +794,22 @@ class SettingsManager:
             logging.error(f"加载导出格式配置失败: {str(e)}")
             return 'txt'
 
+    def load_api_tier(self):
+        """加载API账号版本配置"""
+        try:
+            if not os.path.exists(self.config_manager.config_file):
+                return 'standard'
+            
+            config = configparser.ConfigParser()
+            config.read(self.config_manager.config_file, encoding='utf-8')
+            
+            if 'BaiduAPI' in config:
+                return config['BaiduAPI'].get('tier', 'standard')
+            return 'standard'
+        except Exception as e:
+            logging.error(f"加载账号版本配置失败: {str(e)}")
+            return 'standard'
+
     def load_format_type(self):
         """加载格式化配置"""
         try:
@@ -331,37 +880,54 @@ class SettingsManager:
             logging.error(f"加载语言设置失败: {str(e)}")
             return '自动检测', '英语'
 
+    def _migrate_history(self):
+        """将旧版history.json中的历史记录导入SQLite，完成后改名保留原文件"""
+        if not os.path.exists(self.history_file):
+            return
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+            self.history_store.add_many(history.items())
+            os.replace(self.history_file, self.history_file + '.migrated')
+            logging.info(f"已导入 {len(history)} 条旧版翻译历史")
+        except Exception as e:
+            logging.error(f"导入旧版翻译历史失败: {str(e)}")
+
     def save_translation_history(self, history):
-        """保存翻译历史记录到独立文件"""
+        """用完整的历史记录替换已保存的翻译历史"""
         try:
-            # 确保目录存在
-            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
-            
-            # 使用临时文件确保数据完整性
-            temp_file = self.history_file + '.tmp'
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
-            
-            # 原子性替换文件
-            os.replace(temp_file, self.history_file)
+            self.history_store.clear()
+            self.history_store.add_many(history.items())
             return True
         except Exception as e:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
             logging.error(f"保存翻译历史失败: {str(e)}")
             raise e
 
-    def load_translation_history(self):
-        """从独立文件加载翻译历史记录"""
+    def append_translation_history(self, key, record):
+        """追加一条翻译历史记录"""
         try:
-            if not os.path.exists(self.history_file):
-                return {}
-            
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            self.history_store.add(key, record)
+            return True
+        except Exception as e:
+            logging.error(f"保存翻译历史失败: {str(e)}")
+            return False
+
+    def delete_translation_history(self, key):
+        """删除一条翻译历史记录"""
+        try:
+            return self.history_store.delete(key)
+        except Exception as e:
+            logging.error(f"删除翻译历史失败: {str(e)}")
+            return False
+
+    def load_translation_history(self, limit=None):
+        """加载翻译历史记录，limit为只取最新的条数"""
+        try:
+            return self.history_store.load(limit)
         except Exception as e:
             logging.error(f"加载翻译历史失败: {str(e)}")
             return {}
+
     def save_translation_stats(self, stats):
         """保存翻译统计数据"""
         try:
@@ -1,102 +1,1857 @@
 import requests
 import random
+import math
 import hashlib
 import time
 import logging
 from collections import OrderedDict
-from urllib3.util.retry import Retry
 import threading
+import re
+import asyncio
+import ssl
+import json
+import zlib
+import mmap
+import struct
+import urllib.parse
+import os
+import queue
+import sqlite3
+import atexit
+import weakref
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import pyttsx3
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from collections import deque
+
+class EvictionPolicy:
+    """缓存淘汰策略接口
+
+    策略只管理键的顺序和容量，由TranslationCache在持有锁时调用
+    """
+    name = 'policy'
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+
+    def insert(self, key):
+        """记录新键，超出容量时返回被淘汰的键，否则返回None"""
+        raise NotImplementedError
+
+    def access(self, key):
+        """记录一次命中"""
+        raise NotImplementedError
+
+    def remove(self, key):
+        """移除键（过期或主动删除）"""
+        raise NotImplementedError
+
+    def evict(self):
+        """按策略移除并返回一个键，为空时返回None；用于按字节数淘汰"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+class LRUPolicy(EvictionPolicy):
+    """最近最少使用"""
+    name = 'lru'
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self._order = OrderedDict()
+
+    def insert(self, key):
+        self._order[key] = None
+        if len(self._order) > self.capacity:
+            return self._order.popitem(last=False)[0]
+        return None
+
+    def access(self, key):
+        if key in self._order:
+            self._order.move_to_end(key)
+
+    def remove(self, key):
+        self._order.pop(key, None)
+
+    def evict(self):
+        if not self._order:
+            return None
+        return self._order.popitem(last=False)[0]
+
+    def clear(self):
+        self._order.clear()
+
+class LFUPolicy(EvictionPolicy):
+    """最不经常使用，按访问次数分桶，各操作均为O(1)，同频次内按LRU淘汰"""
+    name = 'lfu'
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self._freq = {}
+        self._buckets = {}  # 访问次数 -> 按最近访问排序的键
+        self._min_freq = 0
+
+    def insert(self, key):
+        victim = None
+        if len(self._freq) >= self.capacity:
+            bucket = self._buckets[self._min_freq]
+            victim = bucket.popitem(last=False)[0]
+            if not bucket:
+                del self._buckets[self._min_freq]
+            del self._freq[victim]
+        self._freq[key] = 1
+        self._buckets.setdefault(1, OrderedDict())[key] = None
+        self._min_freq = 1
+        return victim
+
+    def access(self, key):
+        freq = self._freq.get(key)
+        if freq is None:
+            return
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+            if self._min_freq == freq:
+                self._min_freq = freq + 1
+        self._freq[key] = freq + 1
+        self._buckets.setdefault(freq + 1, OrderedDict())[key] = None
+
+    def remove(self, key):
+        freq = self._freq.pop(key, None)
+        if freq is None:
+            return
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+            if self._min_freq == freq:
+                self._min_freq = min(self._buckets, default=0)
+
+    def evict(self):
+        if not self._freq:
+            return None
+        victim = next(iter(self._buckets[self._min_freq]))
+        self.remove(victim)
+        return victim
+
+    def clear(self):
+        self._freq.clear()
+        self._buckets.clear()
+        self._min_freq = 0
+
+class CountMinSketch:
+    """近似频率统计，计数上限15，累计一定次数后所有计数减半以淡化旧的访问"""
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, capacity):
+        width = 16
+        while width < capacity:
+            width <<= 1
+        self._mask = width - 1
+        self._table = [[0] * width for _ in range(self.DEPTH)]
+        self._additions = 0
+        self._sample_size = 10 * max(capacity, 1)
+
+    def _indexes(self, key):
+        return [hash((seed, key)) & self._mask for seed in range(self.DEPTH)]
+
+    def increment(self, key):
+        for row, index in zip(self._table, self._indexes(key)):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._reset()
+
+    def estimate(self, key):
+        return min(row[index] for row, index in zip(self._table, self._indexes(key)))
+
+    def _reset(self):
+        for row in self._table:
+            for index, count in enumerate(row):
+                row[index] = count >> 1
+        self._additions //= 2
+
+class WTinyLFUPolicy(EvictionPolicy):
+    """W-TinyLFU淘汰策略
+
+    新条目先进入占容量1%的LRU窗口，被挤出窗口时与主区（分段LRU）的淘汰候选比较近似访问频率，
+    频率更高者留下。既能接纳突发的新热点，又不会让一次性扫描冲掉常用条目
+    """
+    name = 'tinylfu'
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self._window_size = max(1, capacity // 100)
+        main_size = max(1, capacity - self._window_size)
+        self._protected_size = max(1, int(main_size * 0.8))
+        self._main_size = main_size
+        self._window = OrderedDict()
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+        self._sketch = CountMinSketch(capacity)
+
+    def insert(self, key):
+        self._sketch.increment(key)
+        self._window[key] = None
+        if len(self._window) <= self._window_size:
+            return None
+
+        candidate = self._window.popitem(last=False)[0]
+        if len(self._probation) + len(self._protected) < self._main_size:
+            self._probation[candidate] = None
+            return None
+        victims = self._probation or self._protected
+        victim = next(iter(victims))
+        if self._sketch.estimate(candidate) > self._sketch.estimate(victim):
+            del victims[victim]
+            self._probation[candidate] = None
+            return victim
+        return candidate
+
+    def access(self, key):
+        self._sketch.increment(key)
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._probation:
+            # 试用区再次命中后晋升到保护区，保护区溢出的条目降回试用区
+            del self._probation[key]
+            self._protected[key] = None
+            if len(self._protected) > self._protected_size:
+                demoted = self._protected.popitem(last=False)[0]
+                self._probation[demoted] = None
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+
+    def remove(self, key):
+        for segment in (self._window, self._probation, self._protected):
+            if segment.pop(key, 0) is None:
+                return
+
+    def evict(self):
+        for segment in (self._probation, self._protected, self._window):
+            if segment:
+                return segment.popitem(last=False)[0]
+        return None
+
+    def clear(self):
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+
+class TimerWheel:
+    """分层时间轮
+
+    每层64个槽，第n层的一个槽跨越64^n个刻度。定时项按到期刻度放入能容纳它的最低一层，
+    低层转完一圈时把上一层当前槽中的定时项下放到低层，添加和到期处理均摊O(1)。
+    不支持取消：到期时由调用方核对对应条目是否仍然有效（惰性取消）
+    """
+    SLOTS = 64
+    BITS = 6
+    LEVELS = 4  # 1秒一刻度时覆盖约194天，更远的定时项放入溢出列表
+
+    def __init__(self, tick=1.0, now=None):
+        self.tick = tick
+        self._now = int((time.time() if now is None else now) / tick)
+        self._levels = [[[] for _ in range(self.SLOTS)] for _ in range(self.LEVELS)]
+        self._overflow = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def schedule(self, deadline, item):
+        """在deadline（时间戳）之后由advance返回item"""
+        self._count += 1
+        self._place(max(math.ceil(deadline / self.tick), self._now + 1), item)
+
+    def advance(self, now=None):
+        """推进到now，返回已到期的定时项列表"""
+        target = int((time.time() if now is None else now) / self.tick)
+        expired = []
+        while self._now < target:
+            self._now += 1
+            self._cascade()
+            slot = self._levels[0][self._now & (self.SLOTS - 1)]
+            if slot:
+                self._levels[0][self._now & (self.SLOTS - 1)] = []
+                expired.extend(item for _, item in slot)
+        self._count -= len(expired)
+        return expired
+
+    def clear(self):
+        for level in self._levels:
+            for index in range(self.SLOTS):
+                level[index] = []
+        self._overflow = []
+        self._count = 0
+
+    def _place(self, due, item):
+        delta = due - self._now
+        for level in range(self.LEVELS):
+            if delta < 1 << (self.BITS * (level + 1)):
+                self._levels[level][(due >> (self.BITS * level)) & (self.SLOTS - 1)].append((due, item))
+                return
+        self._overflow.append((due, item))
+
+    def _cascade(self):
+        """低层转完一圈时，从高到低依次下放上一层当前槽中的定时项"""
+        levels = 0
+        while levels < self.LEVELS - 1 and not self._now & ((1 << (self.BITS * (levels + 1))) - 1):
+            levels += 1
+        if levels == self.LEVELS - 1 and not self._now & ((1 << (self.BITS * self.LEVELS)) - 1):
+            overflow, self._overflow = self._overflow, []
+            for due, item in overflow:
+                self._place(due, item)
+        for level in range(levels, 0, -1):
+            index = (self._now >> (self.BITS * level)) & (self.SLOTS - 1)
+            slot, self._levels[level][index] = self._levels[level][index], []
+            for due, item in slot:
+                self._place(due, item)
+
+class _CacheShard:
+    """TranslationCache的一个分片
+
+    拥有独立的锁、条目、淘汰策略和时间轮，以下方法的调用方需持有lock
+    """
+    def __init__(self, policy, capacity, max_bytes, entry_overhead, expiry_interval):
+        self.lock = threading.Lock()
+        self.entries = {}  # 键摘要 -> (过期时间, 键, 译文, 占用字节数)
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entry_overhead = entry_overhead
+        self.policy = policy(capacity)
+        self.wheel = TimerWheel(tick=expiry_interval)
+        # auto源语言的键摘要 -> (按检测到的语言存储的键摘要, 过期时间)
+        self.aliases = OrderedDict()
+        # 键 -> (过期时间, 暂时性错误结果)
+        self.negative = OrderedDict()
+        self.stats = dict.fromkeys(TranslationCache.STAT_NAMES, 0)
+
+    def lookup(self, digest, now):
+        """查询条目，命中时记录访问，已过期的条目顺便删除"""
+        entry = self.entries.get(digest)
+        if entry is not None and now >= entry[0]:
+            self.remove(digest)
+            self.policy.remove(digest)
+            self.stats['expirations'] += 1
+            entry = None
+        if entry is not None:
+            self.policy.access(digest)
+            self.stats['hits'] += 1
+        return entry
+
+    def resolve(self, digest, now):
+        """解析auto键的映射"""
+        alias = self.aliases.get(digest)
+        if alias is None or alias[1] <= now:
+            return digest
+        return alias[0]
+
+    def set_alias(self, digest, target, expires_at):
+        self.aliases[digest] = (target, expires_at)
+        self.aliases.move_to_end(digest)
+        self.wheel.schedule(expires_at, ('alias', digest))
+        if len(self.aliases) > self.capacity:
+            self.aliases.popitem(last=False)
+
+    def set_negative(self, key, result, expires_at):
+        self.negative[key] = (expires_at, result)
+        self.negative.move_to_end(key)
+        self.wheel.schedule(expires_at, ('negative', key))
+        if len(self.negative) > self.capacity:
+            self.negative.popitem(last=False)
+
+    def store(self, digest, key_blob, value_blob, expires_at):
+        """写入条目，超出条目数或字节数上限时淘汰"""
+        size = len(key_blob) + len(value_blob) + self.entry_overhead
+        if size > self.max_bytes:
+            # 新值放不下时也要删除旧值，否则会继续返回过期的译文
+            if digest in self.entries:
+                self.remove(digest)
+                self.policy.remove(digest)
+            return
+        if digest in self.entries:
+            self.remove(digest)
+            self.policy.access(digest)
+        else:
+            victim = self.policy.insert(digest)
+            if victim is not None:
+                self.stats['evictions'] += 1
+                if victim == digest:
+                    return
+                self.remove(victim)
+        self.entries[digest] = (expires_at, key_blob, value_blob, size)
+        self.bytes += size
+        self.wheel.schedule(expires_at, ('entry', digest))
+        while self.bytes > self.max_bytes:
+            victim = self.policy.evict()
+            if victim is None:
+                break
+            self.remove(victim)
+            self.stats['evictions'] += 1
+
+    def remove(self, digest):
+        """删除条目（不修改淘汰策略）"""
+        entry = self.entries.pop(digest, None)
+        if entry is not None:
+            self.bytes -= entry[3]
+
+    def expire(self, now):
+        """清除时间轮中已到期的条目，返回清除的缓存条目数"""
+        expired = 0
+        for kind, key in self.wheel.advance(now):
+            # 时间轮中的定时项不随条目更新而取消，这里核对条目当前的过期时间
+            if kind == 'entry':
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] <= now:
+                    self.remove(key)
+                    self.policy.remove(key)
+                    expired += 1
+            elif kind == 'alias':
+                alias = self.aliases.get(key)
+                if alias is not None and alias[1] <= now:
+                    del self.aliases[key]
+            else:
+                negative = self.negative.get(key)
+                if negative is not None and negative[0] <= now:
+                    del self.negative[key]
+        self.stats['expirations'] += expired
+        return expired
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+        self.wheel.clear()
+        self.policy.clear()
+        self.aliases.clear()
+        self.negative.clear()
 
 class TranslationCache:
-    """翻译结果缓存管理"""
-    def __init__(self, max_size=1000, timeout=7200):
-        self._cache = OrderedDict()
+    """翻译结果缓存管理
+
+    条目按键的摘要分布到多个分片，每个分片有独立的锁，并发读写不会争用同一把锁；
+    压缩、解压、磁盘和文件读写都在锁外进行。
+    容量按条目数和字节数双重限制，字节数按键和译文的实际存储大小计算。
+    每个条目可单独设置有效期，过期条目由后台线程借助时间轮主动清除。
+    条目以键的摘要索引，同时保存键本身用于校验摘要冲突；较大的键和译文压缩存储。
+    淘汰策略可选lru、lfu、tinylfu（W-TinyLFU），stats()返回命中率等统计用于评估缓存容量
+    """
+    POLICIES = {
+        'lru': LRUPolicy,
+        'lfu': LFUPolicy,
+        'tinylfu': WTinyLFUPolicy,
+    }
+    STAT_NAMES = ('hits', 'snapshot_hits', 'disk_hits', 'misses', 'evictions', 'expirations')
+    COMPRESS_THRESHOLD = 1024  # 超过该字节数的键和译文压缩存储
+    ENTRY_OVERHEAD = 300  # 每个条目的字典、元组、摘要等固定开销估计（字节）
+    # 每个分片至少容纳的条目数和字节数，容量较小时减少分片以保持淘汰顺序准确
+    MIN_SHARD_SIZE = 256
+    MIN_SHARD_BYTES = 256 * 1024
+
+    def __init__(self, max_size=20000, timeout=7200, negative_timeout=30, disk=None, policy='lru',
+                 max_bytes=16 * 1024 * 1024, snapshot=None, volatile_timeout=1800, expiry_interval=1.0,
+                 shards=16, preload=True):
         self._cache_size = max_size
+        self._max_bytes = max_bytes
         self._cache_timeout = timeout
-        self._lock = threading.Lock()
+        # 依赖语言自动检测的结果（auto键映射、未确定源语言的译文）较快过期
+        self._volatile_timeout = volatile_timeout
+        # 暂时性错误的短期缓存：故障期间的重复请求直接返回错误，过期后再请求API
+        self._negative_timeout = negative_timeout
+        self._policy_name = policy
+        shard_count = max(1, min(shards, max_size // self.MIN_SHARD_SIZE, max_bytes // self.MIN_SHARD_BYTES))
+        self._shards = [
+            _CacheShard(self.POLICIES[policy], max(1, max_size // shard_count), max_bytes // shard_count,
+                        self.ENTRY_OVERHEAD, expiry_interval)
+            for _ in range(shard_count)
+        ]
         self._history = OrderedDict()
+        self._history_lock = threading.Lock()
         self._max_history = 100
-        self._save_callback = None
+        # 保存单条历史记录的回调 save_callback(键, 记录)
+        self.save_callback = None
+        # 可选的多进程共享快照和磁盘缓存，依次作为内存缓存之后的下一级
+        self._snapshot = snapshot
+        self._compaction_stop = threading.Event()
+        self._disk = disk
+        # preload为False时由调用方在后台线程中调用warm_up，避免阻塞界面线程
+        if disk is not None and preload:
+            self.warm_up()
+        # 后台线程只持有弱引用，缓存对象不再使用时线程随之退出
+        self._expiry_stop = threading.Event()
+        threading.Thread(
+            target=self._expiry_loop,
+            args=(weakref.ref(self), self._expiry_stop, expiry_interval),
+            name="translate_cache_expiry",
+            daemon=True
+        ).start()
+
+    def _shard(self, digest):
+        return self._shards[digest[0] % len(self._shards)]
         
-    @lru_cache(maxsize=128)
     def get(self, key):
-        """获取缓存"""
-        with self._lock:
-            if key in self._cache:
-                cached_time, cached_result = self._cache[key]
-                if time.time() - cached_time < self._cache_timeout:
-                    self._cache.move_to_end(key)
-                    return cached_result
-                else:
-                    del self._cache[key]
+        """获取缓存，auto源语言的键通过检测语言索引解析，内存未命中时查询磁盘缓存"""
+        digest = self._digest(key)
+        shard = self._shard(digest)
+        now = time.time()
+        with shard.lock:
+            resolved = shard.resolve(digest, now)
+        target = self._shard(resolved)
+        with target.lock:
+            entry = target.lookup(resolved, now)
+            if entry is None and self._disk is None and self._snapshot is None:
+                target.stats['misses'] += 1
+                return None
+
+        if entry is not None:
+            stored_key = self._unpack(entry[1])
+            # 校验键本身，摘要冲突时视为未命中
+            if resolved == digest and stored_key != key:
+                return None
+            if self._disk is not None:
+                self._disk.touch(stored_key)
+            return self._unpack(entry[2])
+
+        # 快照直接在映射的文件上查询，不复制到内存缓存
+        if self._snapshot is not None:
+            cached_result = self._snapshot.get(key)
+            if cached_result is not None:
+                with shard.lock:
+                    shard.stats['snapshot_hits'] += 1
+                return cached_result
+
+        # 磁盘查询在锁外进行，命中后提升到内存缓存
+        disk_entry = self._disk.get(key) if self._disk is not None else None
+        if disk_entry is None:
+            with shard.lock:
+                shard.stats['misses'] += 1
             return None
+        stored_key, cached_result = disk_entry
+        encoded = self._encode(stored_key, cached_result)
+        with shard.lock:
+            shard.stats['disk_hits'] += 1
+            if stored_key != key:
+                shard.set_alias(digest, encoded[0], time.time() + self._volatile_timeout)
+        self._store(*encoded)
+        return cached_result
 
+    def expire(self, now=None):
+        """清除已到期的条目，返回清除的缓存条目数"""
+        now = time.time() if now is None else now
+        expired = 0
+        for shard in self._shards:
+            with shard.lock:
+                expired += shard.expire(now)
+        return expired
 
-    def set(self, key, value):
-        """设置缓存"""
-        with self._lock:
-            current_time = time.time()
-            if len(self._cache) >= self._cache_size:
-                self._cache.popitem(last=False)
-            self._cache[key] = (current_time, value)
-            self._cache.move_to_end(key)
+    @staticmethod
+    def _expiry_loop(cache_ref, stop, interval):
+        while not stop.wait(interval):
+            cache = cache_ref()
+            if cache is None:
+                return
+            cache.expire()
+            del cache
+
+    def stats(self):
+        """返回缓存统计快照
+
+        hit_ratio包含快照和磁盘缓存命中，memory_hit_ratio仅统计内存命中
+        """
+        snapshot = dict.fromkeys(self.STAT_NAMES, 0)
+        snapshot.update(size=0, bytes=0)
+        for shard in self._shards:
+            with shard.lock:
+                for name in self.STAT_NAMES:
+                    snapshot[name] += shard.stats[name]
+                snapshot['size'] += len(shard.entries)
+                snapshot['bytes'] += shard.bytes
+        snapshot.update(capacity=self._cache_size, max_bytes=self._max_bytes,
+                        policy=self._policy_name, shards=len(self._shards))
+        hits = snapshot['hits'] + snapshot['snapshot_hits'] + snapshot['disk_hits']
+        lookups = hits + snapshot['misses']
+        snapshot['hit_ratio'] = hits / lookups if lookups else 0.0
+        snapshot['memory_hit_ratio'] = snapshot['hits'] / lookups if lookups else 0.0
+        return snapshot
+
+    def reset_stats(self):
+        """清零统计计数"""
+        for shard in self._shards:
+            with shard.lock:
+                for name in shard.stats:
+                    shard.stats[name] = 0
+
+    def entries(self, disk_limit=20000):
+        """返回缓存条目快照 [(键, 译文)]，包括磁盘缓存中最常用的disk_limit条"""
+        blobs = []
+        for shard in self._shards:
+            with shard.lock:
+                blobs.extend((entry[1], entry[2]) for entry in shard.entries.values())
+        entries = [(self._unpack(key), self._unpack(value)) for key, value in blobs]
+        if self._disk is not None:
+            entries.extend(self._disk.hottest(disk_limit))
+        return entries
+
+    def clear(self):
+        """清空内存缓存（不影响磁盘缓存）"""
+        for shard in self._shards:
+            with shard.lock:
+                shard.clear()
+
+    def warm_up(self):
+        """从磁盘缓存加载命中次数最多的条目，可在后台线程中与读写并行进行"""
+        try:
+            entries = self._disk.hottest(self._cache_size)
+        except sqlite3.Error as e:
+            logging.error(f"预热缓存失败: {str(e)}")
+            return
+        expires_at = time.time() + self._cache_timeout
+        # 最热的条目最后插入，最晚被淘汰
+        for key, value in reversed(entries):
+            digest, key_blob, value_blob = self._encode(key, value)
+            shard = self._shard(digest)
+            with shard.lock:
+                # 预热期间已写入的译文更新，不覆盖
+                if digest not in shard.entries:
+                    shard.store(digest, key_blob, value_blob, expires_at)
+        logging.info(f"从磁盘缓存预热 {len(entries)} 条翻译")
+
+    def compact_snapshot(self):
+        """将本进程的缓存条目合并进共享快照"""
+        if self._snapshot is None:
+            return False
+        try:
+            return self._snapshot.compact(self.entries())
+        except OSError as e:
+            logging.error(f"合并缓存快照失败: {str(e)}")
+            return False
+
+    def start_compaction(self, interval=600):
+        """启动后台线程，定期合并缓存快照"""
+        def loop():
+            while not self._compaction_stop.wait(interval):
+                self.compact_snapshot()
+        threading.Thread(target=loop, name="translate_snapshot_compaction", daemon=True).start()
+
+    def close(self):
+        """停止后台任务并关闭磁盘缓存，提交尚未写入的条目"""
+        self._compaction_stop.set()
+        self._expiry_stop.set()
+        if self._snapshot is not None:
+            self._snapshot.close()
+        if self._disk is not None:
+            self._disk.close()
+
+
+    def set(self, key, value, detected_lang=None, ttl=None):
+        """设置缓存，ttl为有效期（秒），默认使用缓存的统一有效期
+
+        键的源语言为auto且已知检测结果时，按检测到的语言存储，
+        并记录auto键到该键的映射，使auto与具体语言的请求共用同一条缓存
+        """
+        canonical_key = self._canonical_key(key, detected_lang)
+        if ttl is None:
+            ttl = self._cache_timeout
+            if canonical_key.startswith('auto:'):
+                ttl = min(ttl, self._volatile_timeout)
+        encoded = self._encode(canonical_key, value)
+        digest = self._digest(key) if canonical_key != key else encoded[0]
+        shard = self._shard(digest)
+        with shard.lock:
+            shard.negative.pop(key, None)
+            if canonical_key != key:
+                shard.set_alias(digest, encoded[0], time.time() + self._volatile_timeout)
+        self._store(*encoded, ttl=ttl)
+        if self._disk is not None:
+            self._disk.put(canonical_key, value)
+            if canonical_key != key:
+                self._disk.put_alias(key, canonical_key)
+
+    def _store(self, digest, key_blob, value_blob, ttl=None):
+        """写入所在分片"""
+        expires_at = time.time() + (self._cache_timeout if ttl is None else ttl)
+        shard = self._shard(digest)
+        with shard.lock:
+            shard.store(digest, key_blob, value_blob, expires_at)
+
+    @classmethod
+    def _encode(cls, key, value):
+        """返回 (键摘要, 键存储数据, 译文存储数据)"""
+        return cls._digest(key), cls._pack(key), cls._pack(value)
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+    @classmethod
+    def _pack(cls, text):
+        """编码文本，较大的文本压缩后存储，首字节标记是否压缩"""
+        data = text.encode('utf-8')
+        if len(data) >= cls.COMPRESS_THRESHOLD:
+            compressed = zlib.compress(data)
+            if len(compressed) < len(data):
+                return b'\x01' + compressed
+        return b'\x00' + data
+
+    @staticmethod
+    def _unpack(blob):
+        data = blob[1:]
+        if blob[:1] == b'\x01':
+            data = zlib.decompress(data)
+        return data.decode('utf-8')
+
+    def get_negative(self, key):
+        """获取未过期的暂时性错误结果"""
+        shard = self._shard(self._digest(key))
+        with shard.lock:
+            if key not in shard.negative:
+                return None
+            expires_at, result = shard.negative[key]
+            if time.time() < expires_at:
+                return result
+            del shard.negative[key]
+            return None
+
+    def set_negative(self, key, result, ttl=None):
+        """缓存暂时性错误结果"""
+        expires_at = time.time() + (self._negative_timeout if ttl is None else ttl)
+        shard = self._shard(self._digest(key))
+        with shard.lock:
+            shard.set_negative(key, result, expires_at)
+
+    def get_result(self, key):
+        """查询缓存，命中时返回标记为缓存命中的TranslationResult，否则返回None"""
+        cached_result = self.get(key)
+        if cached_result:
+            return TranslationResult(cached_result, cache_hit=True)
+        failure = self.get_negative(key)
+        return failure.cached() if failure else None
+
+    def set_result(self, key, result):
+        """成功结果按正常有效期缓存，暂时性错误写入短期错误缓存，其余错误不缓存"""
+        if result.ok:
+            self.set(key, result.text, result.detected_lang)
+        elif result.transient:
+            self.set_negative(key, result)
+
+    @staticmethod
+    def _canonical_key(key, detected_lang):
+        """将auto键转换为检测语言键"""
+        from_lang, _, rest = key.partition(':')
+        if from_lang != 'auto' or not rest or not detected_lang or detected_lang == 'auto':
+            return key
+        return f"{detected_lang}:{rest}"
 
     def get_history(self):
         """获取翻译历史"""
-        with self._lock:
+        with self._history_lock:
             return list(self._history.values())
 
     def clear_history(self):
         """清空翻译历史"""
-        with self._lock:
+        with self._history_lock:
             self._history.clear()
     def add_to_history(self, source_text, target_text, from_lang, to_lang, save_callback=None):
-        """添加翻译记录到历史"""
-        with self._lock:
+        """添加翻译记录到历史，save_callback默认使用self.save_callback，只接收新增的一条记录"""
+        save_callback = save_callback or self.save_callback
+        with self._history_lock:
             current_time = time.strftime('%Y-%m-%d %H:%M:%S')
             history_key = f"{current_time}_{hash(source_text)}"
-            
-            self._history[history_key] = {
+            record = {
                 'source_text': source_text,
                 'target_text': target_text,
                 'from_lang': from_lang,
                 'to_lang': to_lang,
                 'time': current_time
             }
+            self._history[history_key] = record
             
             if len(self._history) > self._max_history:
                 self._history.popitem(last=False)
                 
-            # 立即保存到文件
-            if save_callback:
-                save_callback(self._history)
+        # 立即保存，不持有任何缓存的锁；HistoryStore自行串行化写入
+        if save_callback:
+            save_callback(history_key, record)
+
+class DiskCache:
+    """基于SQLite的持久化翻译缓存
+
+    作为内存缓存之后的第二级缓存，程序重启后仍可命中之前的翻译。
+    写入先进入队列，由后台线程合并后批量提交（write-behind）；
+    总大小超过上限时按最近访问时间淘汰；启动时可读取访问最多的条目预热内存缓存
+    """
+    FLUSH_INTERVAL = 1.0  # 合并写入的最长等待时间（秒）
+    BATCH_SIZE = 500  # 单个事务最多提交的操作数
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS translations (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_translations_accessed ON translations(accessed);
+        CREATE INDEX IF NOT EXISTS idx_translations_hits ON translations(hits);
+        CREATE TABLE IF NOT EXISTS aliases (
+            key TEXT PRIMARY KEY,
+            target TEXT NOT NULL
+        );
+    '''
+
+    def __init__(self, db_path, max_bytes=64 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        dirname = os.path.dirname(db_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        self._db_lock = threading.Lock()
+        self._size_estimate = self._total_size()
+        self._queue = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="translate_cache_writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def get(self, key):
+        """读取缓存，返回 (实际存储的键, 译文)，未命中返回None"""
+        with self._db_lock:
+            row = self._conn.execute(
+                'SELECT key, value, created FROM translations '
+                'WHERE key = COALESCE((SELECT target FROM aliases WHERE key = ?), ?)',
+                (key, key)
+            ).fetchone()
+        if row is None or time.time() - row[2] > self.max_age:
+            return None
+        self.touch(row[0])
+        return row[0], row[1]
+
+    def put(self, key, value):
+        """写入缓存（异步）"""
+        self._queue.put(('set', key, value, time.time()))
+
+    def put_alias(self, key, target):
+        """记录auto源语言的键到检测语言键的映射（异步）"""
+        self._queue.put(('alias', key, target))
+
+    def touch(self, key):
+        """记录一次命中（异步），用于淘汰和预热排序"""
+        self._queue.put(('touch', key, time.time()))
+
+    def hottest(self, limit):
+        """返回命中次数最多的未过期条目 [(键, 译文)]，按热度从高到低排列"""
+        with self._db_lock:
+            return self._conn.execute(
+                'SELECT key, value FROM translations WHERE created > ? '
+                'ORDER BY hits DESC, accessed DESC LIMIT ?',
+                (time.time() - self.max_age, limit)
+            ).fetchall()
+
+    def flush(self, timeout=None):
+        """等待队列中已有的写入提交到磁盘"""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self):
+        """提交剩余写入并关闭数据库"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        with self._db_lock:
+            self._conn.close()
+
+    def _write_loop(self):
+        """后台写入线程：合并一段时间内的写入后在一个事务中提交"""
+        while True:
+            op = self._queue.get()
+            if op is None:
+                return
+            batch = [op]
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while op[0] != 'flush' and len(batch) < self.BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    op = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if op is None:
+                    self._apply(batch)
+                    return
+                batch.append(op)
+            self._apply(batch)
+
+    def _apply(self, batch):
+        """提交一批写入操作"""
+        entries = {}
+        aliases = {}
+        touches = {}
+        events = []
+        for op in batch:
+            if op[0] == 'set':
+                _, key, value, now = op
+                entries[key] = (key, value, len(key.encode('utf-8')) + len(value.encode('utf-8')), now, now)
+            elif op[0] == 'alias':
+                aliases[op[1]] = op[2]
+            elif op[0] == 'touch':
+                hits, _ = touches.get(op[1], (0, 0))
+                touches[op[1]] = (hits + 1, op[2])
+            else:
+                events.append(op[1])
+        try:
+            with self._db_lock, self._conn:
+                self._conn.executemany(
+                    'INSERT INTO translations (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, '
+                    'created = excluded.created, accessed = excluded.accessed',
+                    entries.values()
+                )
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO aliases (key, target) VALUES (?, ?)', aliases.items())
+                self._conn.executemany(
+                    'UPDATE translations SET hits = hits + ?, accessed = MAX(accessed, ?) WHERE key = ?',
+                    [(hits, accessed, key) for key, (hits, accessed) in touches.items()]
+                )
+                self._size_estimate += sum(entry[2] for entry in entries.values())
+                if self._size_estimate > self.max_bytes:
+                    self._evict()
+        except sqlite3.Error as e:
+            logging.error(f"写入磁盘缓存失败: {str(e)}")
+        finally:
+            for event in events:
+                event.set()
+
+    def _evict(self):
+        """按最近访问时间淘汰条目，直到总大小降到上限的90%"""
+        total = self._total_size()
+        excess = total - int(self.max_bytes * 0.9)
+        if total > self.max_bytes and excess > 0:
+            keys = []
+            freed = 0
+            for key, size in self._conn.execute('SELECT key, size FROM translations ORDER BY accessed'):
+                keys.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            self._conn.executemany('DELETE FROM translations WHERE key = ?', keys)
+            self._conn.execute('DELETE FROM aliases WHERE target NOT IN (SELECT key FROM translations)')
+            total -= freed
+            logging.info(f"磁盘缓存淘汰 {len(keys)} 条记录")
+        self._size_estimate = total
+
+    def _total_size(self):
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM translations').fetchone()[0]
+
+class SnapshotCache:
+    """只读的内存映射缓存快照，供同一台机器上的多个进程共享
+
+    文件格式：文件头、按键哈希排序的定长索引、存放键和译文的字符串堆。
+    查询在映射的文件上二分查找，各进程共享操作系统的页缓存，无需加载到内存。
+    快照由compact合并各进程的缓存后生成新一代文件（path.<代号>），读取方自动切换到最新一代；
+    不覆盖正在被映射的旧文件，旧文件在不再被使用后删除
+    """
+    MAGIC = b'TRSNAP01'
+    HEADER = struct.Struct('<8sQQ')  # 魔数、条目数、保留
+    RECORD = struct.Struct('<QQII')  # 键哈希、键在文件中的偏移、键长度、译文长度（译文紧跟键）
+    MAX_ENTRIES = 200000
+    REFRESH_INTERVAL = 30  # 检查是否有新一代快照的间隔（秒）
+    LOCK_TIMEOUT = 300  # 超过该秒数的锁文件视为残留
+
+    def __init__(self, path):
+        self.path = path
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self._lock = threading.Lock()
+        self._mm = None
+        self._count = 0
+        self._generation = None
+        self._checked = 0
+        self.refresh()
+
+    def __len__(self):
+        return self._count
+
+    def get(self, key):
+        """查询快照，未命中返回None"""
+        if time.monotonic() - self._checked >= self.REFRESH_INTERVAL:
+            self.refresh()
+        with self._lock:
+            mm, count = self._mm, self._count
+        if not count:
+            return None
+        key_bytes = key.encode('utf-8')
+        key_hash = self._hash(key_bytes)
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if self.RECORD.unpack_from(mm, self.HEADER.size + middle * self.RECORD.size)[0] < key_hash:
+                low = middle + 1
+            else:
+                high = middle
+        # 哈希相同的记录相邻，逐个校验键本身
+        while low < count:
+            record_hash, offset, key_length, value_length = self.RECORD.unpack_from(
+                mm, self.HEADER.size + low * self.RECORD.size)
+            if record_hash != key_hash:
+                break
+            if mm[offset:offset + key_length] == key_bytes:
+                return TranslationCache._unpack(mm[offset + key_length:offset + key_length + value_length])
+            low += 1
+        return None
+
+    def refresh(self):
+        """切换到最新一代快照"""
+        self._checked = time.monotonic()
+        generations = self._generations()
+        if not generations or generations[-1] == self._generation:
+            return
+        latest = generations[-1]
+        try:
+            with open(latest, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, count, _ = self.HEADER.unpack_from(mm, 0)
+            if magic != self.MAGIC:
+                raise ValueError("文件格式不正确")
+        except (OSError, ValueError, struct.error) as e:
+            logging.warning(f"加载缓存快照失败 {latest}: {str(e)}")
+            return
+        with self._lock:
+            # 旧映射不主动关闭，正在查询的线程结束后随引用释放
+            self._mm, self._count, self._generation = mm, count, latest
+        logging.info(f"已加载缓存快照 {os.path.basename(latest)}，共 {count} 条")
+
+    def records(self):
+        """遍历快照中的 (键的UTF-8编码, 译文存储数据)"""
+        with self._lock:
+            mm, count = self._mm, self._count
+        for index in range(count):
+            _, offset, key_length, value_length = self.RECORD.unpack_from(
+                mm, self.HEADER.size + index * self.RECORD.size)
+            yield mm[offset:offset + key_length], mm[offset + key_length:offset + key_length + value_length]
+
+    def compact(self, entries):
+        """将 [(键, 译文)] 合并进快照，生成新一代文件
+
+        通过锁文件保证同一时间只有一个进程在合并，锁被占用或没有新条目时返回False
+        """
+        lock_path = self.path + '.lock'
+        if not self._acquire_file_lock(lock_path):
+            return False
+        try:
+            self.refresh()
+            merged = OrderedDict()
+            changed = False
+            for key, value in entries:
+                key_bytes = key.encode('utf-8')
+                if key_bytes not in merged:
+                    merged[key_bytes] = TranslationCache._pack(value)
+            existing = dict(self.records())
+            for key_bytes, value_blob in merged.items():
+                if existing.get(key_bytes) != value_blob:
+                    changed = True
+                    break
+            if not changed:
+                return False
+            for key_bytes, value_blob in existing.items():
+                if len(merged) >= self.MAX_ENTRIES:
+                    break
+                merged.setdefault(key_bytes, value_blob)
+            self.write(f"{self.path}.{time.time_ns():020d}", merged)
+            self.refresh()
+            self._remove_old_generations()
+            return True
+        finally:
+            os.remove(lock_path)
+
+    @classmethod
+    def write(cls, path, records):
+        """将 {键的UTF-8编码: 译文存储数据} 写为快照文件，先写临时文件再原子重命名"""
+        items = sorted((cls._hash(key), key, value) for key, value in records.items())
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        temp_file = f"{path}.tmp{os.getpid()}"
+        with open(temp_file, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, len(items), 0))
+            offset = cls.HEADER.size + cls.RECORD.size * len(items)
+            for key_hash, key, value in items:
+                f.write(cls.RECORD.pack(key_hash, offset, len(key), len(value)))
+                offset += len(key) + len(value)
+            for _, key, value in items:
+                f.write(key)
+                f.write(value)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+
+    def close(self):
+        with self._lock:
+            self._mm, self._count, self._generation = None, 0, None
+
+    def _generations(self):
+        """按新旧排序的快照文件列表"""
+        dirname = os.path.dirname(self.path) or '.'
+        prefix = os.path.basename(self.path) + '.'
+        try:
+            names = os.listdir(dirname)
+        except OSError:
+            return []
+        return sorted(os.path.join(dirname, name) for name in names
+                      if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+    def _remove_old_generations(self):
+        for path in self._generations()[:-1]:
+            try:
+                os.remove(path)
+            except OSError:
+                # Windows下仍被其他进程映射的文件无法删除，下次合并时再试
+                pass
+
+    def _acquire_file_lock(self, lock_path):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) < self.LOCK_TIMEOUT:
+                    return False
+                os.remove(lock_path)
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except OSError:
+                return False
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        return True
+
+    @staticmethod
+    def _hash(key_bytes):
+        return int.from_bytes(hashlib.blake2b(key_bytes, digest_size=8).digest(), 'little')
+
+class TranslationMatch:
+    """翻译记忆的匹配结果"""
+    def __init__(self, score, source, target, from_lang, text, numbers_match):
+        self.score = score  # 相似度，0~1
+        self.source = source  # 记忆中的原文
+        self.target = target  # 记忆中的译文
+        self.from_lang = from_lang
+        self.text = text  # 按查询文本中的数字调整后的译文
+        self.numbers_match = numbers_match  # 数字与查询文本一致（或已成功替换）
+
+    def __repr__(self):
+        return f"TranslationMatch({self.score:.2f}, {self.source!r} -> {self.text!r})"
+
+class TranslationMemory:
+    """翻译记忆库
+
+    以字符三元组倒排索引保存过去的翻译，按Dice系数查找相似原文，
+    用于命中空白不同、个别字符识别错误或仅数字不同的近似文本。
+    计算相似度时数字统一替换为占位符，数字差异由译文中的数字替换处理
+    """
+    NGRAM = 3
+    MAX_TEXT_LENGTH = 2000  # 超过该长度的文本不入库也不查询
+    # 与拉丁字母相连的数字视为字符识别错误（如app1e），不作为数字处理
+    NUMBER_PATTERN = re.compile(r'(?<![A-Za-z])\d+(?:[.,]\d+)*(?![A-Za-z])')
+
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # 条目id -> (源语言, 目标语言, 原文, 译文, 三元组集合)
+        self._ids = {}  # (源语言, 目标语言, 规范化原文) -> 条目id
+        self._index = {}  # (目标语言, 三元组) -> 条目id集合
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, from_lang, to_lang, source, target):
+        """加入一条翻译，相同原文的旧译文被替换"""
+        normalized = self._normalize(source)
+        if not normalized or not target or len(normalized) > self.MAX_TEXT_LENGTH:
+            return
+        grams = self._grams(normalized)
+        with self._lock:
+            old_id = self._ids.get((from_lang, to_lang, normalized))
+            if old_id is not None:
+                self._remove(old_id)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (from_lang, to_lang, source, target, grams)
+            self._ids[(from_lang, to_lang, normalized)] = entry_id
+            for gram in grams:
+                self._index.setdefault((to_lang, gram), set()).add(entry_id)
+            if len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def load_cache(self, cache):
+        """从翻译缓存导入条目"""
+        count = 0
+        for key, value in cache.entries():
+            from_lang, to_lang, source = key.split(':', 2)
+            self.add(from_lang, to_lang, source, value)
+            count += 1
+        return count
+
+    def load_history(self, records, lang_code=None):
+        """从历史记录导入条目，lang_code用于将记录中的语言名称转换为语言代码"""
+        count = 0
+        for record in records:
+            from_lang = record.get('from_lang', 'auto')
+            to_lang = record.get('to_lang', '')
+            if lang_code:
+                from_lang, to_lang = lang_code(from_lang), lang_code(to_lang)
+            self.add(from_lang, to_lang, record.get('source_text', ''), record.get('target_text', ''))
+            count += 1
+        return count
+
+    def lookup(self, text, from_lang, to_lang, threshold=0.5, limit=5):
+        """查找相似度不低于threshold的条目，按相似度从高到低返回TranslationMatch列表
+
+        from_lang为auto时匹配任意源语言
+        """
+        normalized = self._normalize(text)
+        if not normalized or len(normalized) > self.MAX_TEXT_LENGTH:
+            return []
+        grams = self._grams(normalized)
+        # 前缀过滤：相似度达到threshold的条目至少共享min_shared个三元组，
+        # 因此必然出现在最稀有的 len(grams) - min_shared + 1 个三元组的倒排表中
+        min_shared = max(1, math.ceil(threshold * len(grams) / (2 - threshold)))
+        with self._lock:
+            ordered = sorted(grams, key=lambda gram: len(self._index.get((to_lang, gram), ())))
+            entry_ids = set()
+            for gram in ordered[:len(grams) - min_shared + 1]:
+                entry_ids.update(self._index.get((to_lang, gram), ()))
+            candidates = []
+            for entry_id in entry_ids:
+                entry_from, _, source, target, entry_grams = self._entries[entry_id]
+                if from_lang != 'auto' and entry_from != from_lang:
+                    continue
+                score = 2 * len(grams & entry_grams) / (len(grams) + len(entry_grams))
+                if score >= threshold:
+                    candidates.append((score, entry_id, entry_from, source, target))
+        candidates.sort(key=lambda candidate: (-candidate[0], -candidate[1]))
+
+        matches = []
+        for score, _, entry_from, source, target in candidates[:limit]:
+            if self._normalize(source) == normalized:
+                score = 1.0
+            adapted, numbers_match = self._adapt_numbers(source, target, text)
+            matches.append(TranslationMatch(score, source, target, entry_from, adapted, numbers_match))
+        return matches
+
+    def best_match(self, text, from_lang, to_lang, threshold):
+        """返回可直接使用的最佳匹配：相似度不低于threshold且数字一致，否则返回None"""
+        for match in self.lookup(text, from_lang, to_lang, threshold):
+            if match.numbers_match:
+                return match
+        return None
+
+    def _remove(self, entry_id):
+        """删除条目，调用方需持有锁"""
+        from_lang, to_lang, source, _, grams = self._entries.pop(entry_id)
+        self._ids.pop((from_lang, to_lang, self._normalize(source)), None)
+        for gram in grams:
+            postings = self._index.get((to_lang, gram))
+            if postings is not None:
+                postings.discard(entry_id)
+                if not postings:
+                    del self._index[(to_lang, gram)]
+
+    @classmethod
+    def _adapt_numbers(cls, source, target, query):
+        """原文与查询仅数字不同时，将译文中对应的数字替换为查询中的数字
+
+        返回 (译文, 数字是否一致)
+        """
+        old_numbers = cls.NUMBER_PATTERN.findall(source)
+        new_numbers = cls.NUMBER_PATTERN.findall(query)
+        if old_numbers == new_numbers:
+            return target, True
+        if len(old_numbers) != len(new_numbers) or cls.NUMBER_PATTERN.findall(target) != old_numbers:
+            return target, False
+        replacements = iter(new_numbers)
+        return cls.NUMBER_PATTERN.sub(lambda _: next(replacements), target), True
+
+    @staticmethod
+    def _normalize(text):
+        return re.sub(r'\s+', ' ', text).strip().lower()
+
+    @classmethod
+    def _grams(cls, normalized):
+        padded = f" {cls.NUMBER_PATTERN.sub('#', normalized)} "
+        return frozenset(padded[i:i + cls.NGRAM] for i in range(len(padded) - cls.NGRAM + 1))
+
+class TranslationResult:
+    """翻译结果
+
+    成功时text为译文；失败时text为可直接显示的错误信息，error_class标明错误类别
+    """
+    TRANSIENT = 'transient'  # 网络故障、限流、服务暂时不可用等，稍后重试可能成功
+    FATAL = 'fatal'  # 未配置密钥、签名错误等，重试无意义
+
+    def __init__(self, text, detected_lang=None, latency=0.0, cache_hit=False,
+                 error_class=None, error_code=None, items=None, match_score=None):
+        self.text = text
+        self.detected_lang = detected_lang
+        self.latency = latency
+        self.cache_hit = cache_hit
+        self.error_class = error_class
+        self.error_code = error_code
+        self.items = items or []  # API返回的逐行结果
+        self.match_score = match_score  # 来自翻译记忆的近似匹配时为相似度
+
+    @classmethod
+    def failure(cls, message, error_class, error_code=None, latency=0.0):
+        return cls(message, latency=latency, error_class=error_class, error_code=error_code)
+
+    @property
+    def ok(self):
+        return self.error_class is None
+
+    @property
+    def transient(self):
+        return self.error_class == self.TRANSIENT
+
+    @property
+    def fuzzy(self):
+        """是否为翻译记忆中相似原文的译文，只能作为建议，不是该原文的确切翻译"""
+        return self.match_score is not None
+
+    def cached(self):
+        """返回标记为缓存命中的副本"""
+        return TranslationResult(self.text, self.detected_lang, 0.0, True,
+                                 self.error_class, self.error_code, self.items, self.match_score)
+
+    def __repr__(self):
+        status = 'ok' if self.ok else self.error_class
+        return f"TranslationResult({status}, {self.text!r}, cache_hit={self.cache_hit})"
+
+class RateLimiter:
+    """令牌桶限流器，由所有翻译线程共享
+
+    请求按到达顺序预约令牌并排队等待，而不是直接失败；
+    收到限流错误(54003)时速率减半，之后随成功请求逐步恢复
+    """
+    # 百度翻译各账号版本的QPS上限
+    TIER_QPS = {
+        'standard': 1,
+        'advanced': 10,
+        'premium': 100
+    }
+
+    def __init__(self, qps=10, burst=None, min_qps=0.5):
+        self._max_rate = float(qps)
+        self._min_rate = min(float(min_qps), self._max_rate)
+        self._rate = self._max_rate
+        self._capacity = float(burst) if burst else max(1.0, self._max_rate)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_tier(cls, tier):
+        """按账号版本创建限流器"""
+        return cls(qps=cls.TIER_QPS.get(tier, cls.TIER_QPS['standard']))
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def acquire(self, timeout=None):
+        """获取一个令牌，必要时阻塞等待；超时返回False"""
+        wait = self._reserve(timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, timeout=None):
+        """acquire的协程版本，等待期间不阻塞事件循环"""
+        wait = self._reserve(timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def _reserve(self, timeout):
+        """预约一个令牌，返回需要等待的秒数；超过timeout时不预约并返回None"""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0
+            if timeout is not None and wait > timeout:
+                self._tokens += 1
+                return None
+        return wait
+
+    def on_throttled(self):
+        """收到限流错误时降低速率并清空令牌"""
+        with self._lock:
+            self._refill()
+            self._rate = max(self._min_rate, self._rate / 2)
+            self._tokens = min(self._tokens, 0)
+            logging.warning(f"触发API限流，请求速率降至 {self._rate:.2f} QPS")
+
+    def on_success(self):
+        """请求成功后逐步恢复速率"""
+        if self._rate >= self._max_rate:
+            return
+        with self._lock:
+            self._rate = min(self._max_rate, self._rate + self._max_rate * 0.1)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+class SingleFlight:
+    """合并相同键的并发请求
+
+    同一键同时只有首个调用者真正执行请求，其余调用者等待并共享其结果
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def claim(self, key):
+        """登记对key的请求，返回 (future, 是否为首个调用者)
+
+        首个调用者必须在完成后调用release发布结果
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def release(self, key, result=None, exception=None):
+        """发布首个调用者的结果并唤醒等待者"""
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is None:
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, *args):
+        """执行fn，若同一键已有请求在进行中则等待其结果"""
+        future, leader = self.claim(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            self.release(key, exception=e)
+            raise
+        self.release(key, result)
+        return result
+
+class RetryPolicy:
+    """重试策略：按百度错误码区分可重试与不可重试错误，使用带抖动的指数退避"""
+    # 52001 请求超时、52002 系统错误、54003 访问频率受限、54005 长query请求频繁
+    RETRYABLE_ERROR_CODES = frozenset({'52001', '52002', '54003', '54005'})
+    RETRYABLE_HTTP_STATUS = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable_code(self, error_code):
+        return str(error_code) in self.RETRYABLE_ERROR_CODES
+
+    def is_retryable_exception(self, error):
+        """网络错误、超时和5xx响应可重试"""
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code in self.RETRYABLE_HTTP_STATUS
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    def on_http_status(self, status, rate_limiter, circuit_breaker):
+        """按HTTP错误状态码更新限流器和熔断器，返回是否应重试
+
+        同步和异步翻译器共用，保证同一响应在两条路径上的处理一致：
+        429降低请求速率且不计入熔断，其他可重试状态计为失败，
+        其余状态（如403、404）不能说明服务状态，只归还熔断器的试探名额
+        """
+        if status == 429:
+            rate_limiter.on_throttled()
+            circuit_breaker.record_success()
+            return True
+        if status in self.RETRYABLE_HTTP_STATUS:
+            circuit_breaker.record_failure()
+            return True
+        circuit_breaker.release()
+        return False
+
+    def backoff(self, attempt):
+        """第attempt次重试前的等待时间（全抖动）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败达到阈值后进入熔断状态，冷却期内请求直接失败；
+    冷却结束后放行一个试探请求，成功则恢复，失败则重新熔断
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self):
+        """是否放行请求"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            # 半开状态只放行一个试探请求
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        """请求结果不能说明服务状态时调用（如本地构造请求出错），只归还半开状态的试探名额"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logging.warning("翻译服务连续失败，已熔断")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+class LatencyTracker:
+    """记录最近请求的延迟，用于计算对冲请求的触发阈值"""
+    def __init__(self, window=200, min_samples=20):
+        self._samples = deque(maxlen=window)
+        self._min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction):
+        """返回延迟分位数，样本不足时返回None"""
+        with self._lock:
+            if len(self._samples) < self._min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class TranslationBackend:
+    """翻译后端接口
+
+    后端负责单次请求的构造、传输和解码，返回统一的百度格式结果字典
+    （含trans_result，或error_code和error_msg）；
+    重试、限流、缓存等由翻译器统一处理
+    """
+    name = 'backend'
+    SUCCESS_CODE = '52000'
+
+    @property
+    def configured(self):
+        """后端是否已具备发送请求的条件"""
+        return True
+
+    def build_request(self, query, from_lang, to_lang):
+        """构造请求，返回 (method, url, params)"""
+        raise NotImplementedError
+
+    def send(self, session, query, from_lang, to_lang, timeout):
+        """通过requests会话发送请求，返回结果字典"""
+        method, url, params = self.build_request(query, from_lang, to_lang)
+        if method == 'POST':
+            response = session.post(url, data=params, timeout=timeout)
+        else:
+            response = session.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def warm(self, session, timeout):
+        """预热到后端的连接"""
+        pass
+
+    @classmethod
+    def to_result(cls, result, latency=0.0):
+        """将结果字典转换为TranslationResult"""
+        error_code = str(result.get('error_code', cls.SUCCESS_CODE))
+        if error_code != cls.SUCCESS_CODE:
+            error_class = (TranslationResult.TRANSIENT if error_code in RetryPolicy.RETRYABLE_ERROR_CODES
+                           else TranslationResult.FATAL)
+            return TranslationResult.failure(
+                f"翻译错误: {result.get('error_msg', '未知错误')}", error_class, error_code, latency)
+        
+        trans_result = result.get('trans_result', [])
+        if not trans_result:
+            return TranslationResult.failure("未获取到翻译结果", TranslationResult.TRANSIENT, latency=latency)
+        
+        text = '\n'.join(item['dst'] for item in trans_result if 'dst' in item)
+        return TranslationResult(text, result.get('from'), latency, items=trans_result)
+
+class BaiduBackend(TranslationBackend):
+    """百度翻译开放平台后端"""
+    name = 'baidu'
+    API_URL = 'https://fanyi-api.baidu.com/api/trans/vip/translate'
+    POST_THRESHOLD = 2000  # 编码后参数超过该长度时改用POST表单
+
+    def __init__(self, appid, appkey, api_url=None):
+        self.appid = appid
+        self.appkey = appkey
+        self.api_url = api_url or self.API_URL
+
+    @property
+    def configured(self):
+        return bool(self.appid and self.appkey)
+
+    def build_request(self, query, from_lang, to_lang):
+        """生成带签名的请求参数，参数较长时改用POST表单，避免URL过长"""
+        salt = str(random.randint(32768, 65536))
+        sign = hashlib.md5(f"{self.appid}{query}{salt}{self.appkey}".encode()).hexdigest()
+        
+        params = {
+            'q': query,
+            'from': from_lang,
+            'to': to_lang,
+            'appid': self.appid,
+            'salt': salt,
+            'sign': sign
+        }
+        method = 'POST' if len(urllib.parse.urlencode(params)) > self.POST_THRESHOLD else 'GET'
+        return method, self.api_url, params
+
+    def warm(self, session, timeout):
+        session.head(self.api_url, timeout=timeout)
+
+class LocalBackend(BaiduBackend):
+    """本地替身后端，连接LocalTranslationServer，无需网络和API额度"""
+    name = 'local'
+
+    def __init__(self, api_url, appid='local', appkey='local'):
+        super().__init__(appid, appkey, api_url)
+
+class LocalTranslationServer(ThreadingHTTPServer):
+    """讲百度协议的本地翻译服务，用于开发和压力测试
+
+    译文为 "[目标语言]原文"；可配置响应延迟和暂时错误(52001)比例，
+    用于测试缓存、分块、并发和重试逻辑
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, error_rate=0):
+        super().__init__((host, port), _LocalTranslationHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/trans/vip/translate"
+
+    def backend(self):
+        """创建连接本服务的后端"""
+        return LocalBackend(self.url)
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name="local_translation_server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务并释放端口"""
+        self.shutdown()
+        self.server_close()
+
+    def handle_translate(self, params):
+        """按百度协议生成响应"""
+        with self._count_lock:
+            self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            return {'error_code': '52001', 'error_msg': 'TIMEOUT'}
+
+        query = params.get('q', '')
+        if not query:
+            return {'error_code': '54000', 'error_msg': 'PARAM_FROM_TO_OR_Q_EMPTY'}
+        from_lang = params.get('from', 'auto')
+        to_lang = params.get('to', 'zh')
+        if from_lang == 'auto':
+            from_lang = 'zh' if re.search(r'[\u4e00-\u9fff]', query) else 'en'
+        return {
+            'from': from_lang,
+            'to': to_lang,
+            'trans_result': [
+                {'src': line, 'dst': f"[{to_lang}]{line}"}
+                for line in query.split('\n') if line.strip()
+            ]
+        }
+
+class _LocalTranslationHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        query = urllib.parse.urlsplit(self.path).query
+        self._respond(dict(urllib.parse.parse_qsl(query)))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        self._respond(dict(urllib.parse.parse_qsl(body)))
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _respond(self, params):
+        body = json.dumps(self.server.handle_translate(params), ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
 
 class BaiduTranslator:
-    def __init__(self, appid, appkey):
+    MAX_QUERY_BYTES = 6000  # 单次请求q参数的长度上限（UTF-8字节）
+    POOL_SIZE = 30  # 连接池大小，同时也是并发请求的上限
+    THROTTLE_ERROR_CODE = '54003'  # 访问频率受限
+    PREWARM_CONNECTIONS = 2  # 预热时建立的连接数
+    KEEPALIVE_INTERVAL = 30  # 连接空闲超过该秒数时发送保活请求
+    HEDGE_CREDIT_CAP = 10  # 对冲额度最多累积的次数
+
+    def __init__(self, appid, appkey, tier='standard', qps=None, prewarm=False, backend=None,
+                 secondary_backend=None, hedge_percentile=0.95, hedge_ratio=0.05, cache=None,
+                 memory=None, fuzzy_threshold=None):
         self.appid = appid
         self.appkey = appkey
-        self.api_url = 'https://fanyi-api.baidu.com/api/trans/vip/translate'
+        self.backend = backend or BaiduBackend(appid, appkey)
+        # 对冲请求：超过近期延迟分位数仍未返回时，向备用后端（或同一后端的另一连接）再发一次
+        self.secondary_backend = secondary_backend
+        self.hedge_percentile = hedge_percentile
+        self.hedge_ratio = hedge_ratio
+        self.latency_tracker = LatencyTracker()
+        self._hedge_credits = 0.0
+        self._hedge_lock = threading.Lock()
+        self._hedge_executor = ThreadPoolExecutor(
+            max_workers=self.POOL_SIZE,
+            thread_name_prefix="translate_hedge"
+        )
         self.session = requests.Session()
         self.timeout = 10
-        self.cache = TranslationCache()
+        self.cache = cache if cache is not None else TranslationCache()
+        # 翻译记忆：成功的翻译都会入库。设置fuzzy_threshold后，translate_result、translate_stream
+        # 和translate_many_results对足够相似的原文返回标记为fuzzy的建议译文；translate和translate_many不使用
+        self.memory = memory
+        self.fuzzy_threshold = fuzzy_threshold
+        self.rate_limiter = RateLimiter(qps=qps) if qps else RateLimiter.for_tier(tier)
+        self._inflight = SingleFlight()
+        self.retry_policy = RetryPolicy()
+        self.circuit_breaker = CircuitBreaker()
+        self._last_used = time.monotonic()
+        self._closed = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.POOL_SIZE,
+            thread_name_prefix="translate_chunk"
+        )
         self.tts_engine = pyttsx3.init()  # 初始化语音引擎
         
         self._init_session()
         self._init_tts()  # 初始化语音设置
-    
+        if prewarm:
+            threading.Thread(target=self._keepalive_loop, name="translate_keepalive", daemon=True).start()
+
+    def _keepalive_loop(self):
+        """预热连接池，之后在连接空闲时定期保活"""
+        self._warm_connections(self.PREWARM_CONNECTIONS)
+        while not self._closed.wait(self.KEEPALIVE_INTERVAL):
+            if time.monotonic() - self._last_used >= self.KEEPALIVE_INTERVAL:
+                self._warm_connections(1)
+
+    def _warm_connections(self, count):
+        """提前完成DNS解析和TCP/TLS握手，使连接进入连接池"""
+        def ping():
+            try:
+                self.backend.warm(self.session, self.timeout)
+            except Exception as e:
+                logging.debug(f"预热连接失败: {str(e)}")
+
+        futures = [self._executor.submit(ping) for _ in range(count)]
+        for future in futures:
+            future.result()
+        self._last_used = time.monotonic()
+
+    def close(self):
+        """停止后台任务并关闭连接"""
+        self._closed.set()
+        self._executor.shutdown(wait=False)
+        self._hedge_executor.shutdown(wait=False)
+        self.session.close()
+
     def _init_session(self):
         """初始化会话配置"""
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504]
-        )
         adapter = requests.adapters.HTTPAdapter(
-            pool_connections=30,  # 增加连接池大小
-            pool_maxsize=30,
-            max_retries=retry_strategy
+            pool_connections=self.POOL_SIZE,  # 增加连接池大小
+            pool_maxsize=self.POOL_SIZE,
+            max_retries=0  # 重试由RetryPolicy统一处理，避免重复重试
         )
         self.session.mount('http://', adapter)
         self.session.mount('https://', adapter)
@@ -108,54 +1863,368 @@ class BaiduTranslator:
         })
 
     def translate(self, query, from_lang='auto', to_lang='zh'):
-        """翻译文本"""
-        query = self.preprocessor.clean_text(query)
+        """翻译文本，返回译文或错误信息（只使用确切的译文，不使用翻译记忆中的近似译文）"""
+        return self.translate_result(query, from_lang, to_lang, allow_fuzzy=False).text
+
+    def translate_result(self, query, from_lang='auto', to_lang='zh', allow_fuzzy=True):
+        """翻译文本，返回TranslationResult
+
+        allow_fuzzy且设置了fuzzy_threshold时，可能返回翻译记忆中的近似译文（fuzzy为True）
+        """
         if not query.strip():
-            return "请输入要翻译的文本"
+            return TranslationResult.failure("请输入要翻译的文本", TranslationResult.FATAL)
+        return self._translate_segments(query, from_lang, to_lang, allow_fuzzy)
 
-        cache_key = f"{from_lang}:{to_lang}:{query}"
-        cached_result = self.cache.get(cache_key)
-        if cached_result:
+    def _split_segments(self, query):
+        """按段落（超长段落按句子）切分，返回 (片段, 分隔符) 列表
+
+        片段去掉首尾空白作为缓存键，修改缩进不会导致重新翻译；
+        去掉的空白移入空片段和分隔符，拼接结果仍保留原文的空行和缩进
+        """
+        segments = []
+        for unit, separator in TextChunker.split(query, self.MAX_QUERY_BYTES, merge=False):
+            body = unit.strip()
+            if not body:
+                segments.append(('', unit + separator))
+                continue
+            leading = unit[:len(unit) - len(unit.lstrip())]
+            if leading:
+                segments.append(('', leading))
+            segments.append((body, unit[len(unit.rstrip()):] + separator))
+        return segments
+
+    def _translate_segments(self, query, from_lang, to_lang, allow_fuzzy=True):
+        """逐段查询缓存，只请求缺失的段落，再按原顺序拼接
+
+        修改长文本中的一处后重新翻译，只需请求被修改的段落
+        """
+        start = time.monotonic()
+        segments = self._split_segments(query)
+        results = self.translate_many_results([unit for unit, _ in segments], from_lang, to_lang, allow_fuzzy)
+        for result in results:
+            if not result.ok:
+                return result
+        if len(results) == 1 and not segments[0][1]:
+            return results[0]
+        detected_lang = next((result.detected_lang for result in results if result.detected_lang), None)
+        # 任一段落为近似译文时，整体也只是建议，相似度取最低值
+        scores = [result.match_score for result in results if result.fuzzy]
+        return TranslationResult(
+            ''.join(result.text + separator for result, (_, separator) in zip(results, segments)),
+            detected_lang,
+            time.monotonic() - start,
+            cache_hit=all(result.cache_hit for result in results),
+            match_score=min(scores) if scores else None
+        )
+
+    def translate_stream(self, query, from_lang='auto', to_lang='zh', allow_fuzzy=True):
+        """流式翻译，按原文顺序逐段产出TranslationResult（译文含原段落分隔符）
+
+        已缓存的段落和翻译记忆中的近似译文（fuzzy为True，需由调用方标明为建议）直接产出；缺失的段落中首段单独请求以尽快显示，
+        其余按当前限流速率分组并发请求；出错时产出错误结果后停止
+        """
+        if not query.strip():
+            yield TranslationResult.failure("请输入要翻译的文本", TranslationResult.FATAL)
+            return
+
+        segments = self._split_segments(query)
+        results = [
+            self._lookup(f"{from_lang}:{to_lang}:{unit}", allow_fuzzy) if unit else TranslationResult('')
+            for unit, _ in segments
+        ]
+        missing = list(OrderedDict.fromkeys(unit for (unit, _), result in zip(segments, results) if result is None))
+        # 与translate_many_results相同，其他线程正在翻译的段落不重复发送，等待其结果
+        owned = []
+        waiting = {}
+        for unit in missing:
+            future, leader = self._inflight.claim(f"{from_lang}:{to_lang}:{unit}")
+            if leader:
+                owned.append(unit)
+            else:
+                waiting[unit] = future
+        groups = {}
+        futures = {}
+        for group in self._stream_groups(owned):
+            future = self._executor.submit(self._request_claimed, group, from_lang, to_lang)
+            groups[future] = group
+            for position, unit in enumerate(group):
+                futures[unit] = (future, position)
+
+        for (unit, separator), result in zip(segments, results):
+            if result is None and unit in waiting:
+                result = waiting[unit].result()
+            elif result is None:
+                future, position = futures[unit]
+                result = future.result()[position]
+            if not result.ok:
+                # 尚未开始的请求取消，并将错误发布给等待这些段落的调用者
+                for future, group in groups.items():
+                    if future.cancel():
+                        for cancelled in group:
+                            self._inflight.release(f"{from_lang}:{to_lang}:{cancelled}", result)
+                yield result
+                return
+            yield TranslationResult(result.text + separator, result.detected_lang, result.latency,
+                                    result.cache_hit, items=result.items, match_score=result.match_score)
+
+    def _request_claimed(self, batch, from_lang, to_lang):
+        """请求已在SingleFlight中登记的段落，完成后向等待者发布结果"""
+        try:
+            results = self._request_batch(batch, from_lang, to_lang)
+        except BaseException as e:
+            for segment in batch:
+                self._inflight.release(f"{from_lang}:{to_lang}:{segment}", exception=e)
+            raise
+        for segment, result in zip(batch, results):
+            self._inflight.release(f"{from_lang}:{to_lang}:{segment}", result)
+        return results
+
+    def _stream_groups(self, units):
+        """首段单独成组，其余段落合并为不超过限流速率的组数"""
+        if len(units) <= 1:
+            return [[unit] for unit in units]
+        max_groups = max(1, int(self.rate_limiter.rate))
+        per_group = -(-(len(units) - 1) // max_groups)
+        groups = [[units[0]]]
+        group_size = 0
+        for unit in units[1:]:
+            size = TextChunker._size(unit)
+            if (len(groups) > 1 and len(groups[-1]) < per_group
+                    and group_size + 1 + size <= self.MAX_QUERY_BYTES):
+                groups[-1].append(unit)
+                group_size += 1 + size
+                continue
+            groups.append([unit])
+            group_size = size
+        return groups
+
+    def _lookup(self, cache_key, allow_fuzzy=False):
+        """查询缓存，未命中且allow_fuzzy时在翻译记忆中查找足够相似的译文
+
+        近似译文不是缓存命中，以match_score标明相似度，也不写入缓存
+        """
+        cached_result = self.cache.get_result(cache_key)
+        if cached_result or not allow_fuzzy or self.memory is None or self.fuzzy_threshold is None:
             return cached_result
+        from_lang, to_lang, query = cache_key.split(':', 2)
+        match = self.memory.best_match(query, from_lang, to_lang, self.fuzzy_threshold)
+        if match is None:
+            return None
+        logging.info(f"使用翻译记忆中的近似译文（相似度 {match.score:.2f}）")
+        return TranslationResult(match.text, match.from_lang, match_score=match.score)
 
-        result = self._request_translation(query, from_lang, to_lang)
-        if result:
-            self.cache.set(cache_key, result)
-        return result
+    def _remember(self, cache_key, result):
+        """写入缓存，成功的结果同时加入翻译记忆"""
+        self.cache.set_result(cache_key, result)
+        if result.ok and self.memory is not None:
+            from_lang, to_lang, query = cache_key.split(':', 2)
+            self.memory.add(result.detected_lang or from_lang, to_lang, query, result.text)
 
-    def _request_translation(self, query, from_lang, to_lang):
-        """请求翻译API"""
-        if not self.appid or not self.appkey:
-            return "请先配置API密钥"
-            
-        salt = str(random.randint(32768, 65536))
-        sign = hashlib.md5(f"{self.appid}{query}{salt}{self.appkey}".encode()).hexdigest()
-        
-        params = {
-            'q': query,
-            'from': from_lang,
-            'to': to_lang,
-            'appid': self.appid,
-            'salt': salt,
-            'sign': sign
-        }
-        
+    def translate_many(self, segments, from_lang='auto', to_lang='zh'):
+        """批量翻译多段文本，尽量合并为少量请求
+
+        返回与segments一一对应的译文列表，缓存命中的段落不会发送请求，不使用近似译文
+        """
+        return [result.text for result in self.translate_many_results(segments, from_lang, to_lang, False)]
+
+    def translate_many_results(self, segments, from_lang='auto', to_lang='zh', allow_fuzzy=True):
+        """批量翻译多段文本，返回与segments一一对应的TranslationResult列表"""
+        results = [None] * len(segments)
+        pending = OrderedDict()  # 待翻译文本 -> 对应的下标列表
+        for index, segment in enumerate(segments):
+            if not segment or not segment.strip():
+                results[index] = TranslationResult('')
+                continue
+            cached_result = self._lookup(f"{from_lang}:{to_lang}:{segment}", allow_fuzzy)
+            if cached_result:
+                results[index] = cached_result
+                continue
+            pending.setdefault(segment, []).append(index)
+
+        # 其他线程正在翻译的段落不重复发送，等待其结果
+        owned = []
+        waiting = {}
+        for segment in pending:
+            future, leader = self._inflight.claim(f"{from_lang}:{to_lang}:{segment}")
+            if leader:
+                owned.append(segment)
+            else:
+                waiting[segment] = future
+
+        translated = {}
         try:
-            response = self.session.get(self.api_url, params=params, timeout=self.timeout)
-            response.raise_for_status()
-            result = response.json()
-            
-            if 'error_code' in result:
-                return f"翻译错误: {result.get('error_msg', '未知错误')}"
-            
-            trans_result = result.get('trans_result', [])
-            if not trans_result:
-                return "未获取到翻译结果"
-            
-            return '\n'.join(item['dst'] for item in trans_result if 'dst' in item)
+            batches = self._pack_segments(owned)
+            if len(batches) > 1:
+                batch_results = self._executor.map(
+                    lambda batch: self._request_batch(batch, from_lang, to_lang), batches)
+            else:
+                batch_results = [self._request_batch(batch, from_lang, to_lang) for batch in batches]
+            for batch, batch_result in zip(batches, batch_results):
+                translated.update(zip(batch, batch_result))
+        except BaseException as e:
+            for segment in owned:
+                self._inflight.release(f"{from_lang}:{to_lang}:{segment}", exception=e)
+            raise
+        for segment in owned:
+            self._inflight.release(f"{from_lang}:{to_lang}:{segment}", translated[segment])
+
+        for segment, future in waiting.items():
+            translated[segment] = future.result()
+        for segment, indices in pending.items():
+            for index in indices:
+                results[index] = translated[segment]
+        return results
+
+    def _pack_segments(self, segments):
+        """按API单次请求的大小上限将段落打包"""
+        batches = []
+        batch = []
+        batch_size = 0
+        for segment in segments:
+            size = len(segment.encode('utf-8'))
+            # 多行段落无法与返回结果逐行对应，单独发送
+            if '\n' in segment or size >= self.MAX_QUERY_BYTES:
+                batches.append([segment])
+                continue
+            if batch and batch_size + 1 + size > self.MAX_QUERY_BYTES:
+                batches.append(batch)
+                batch = []
+                batch_size = 0
+            batch_size += size + (1 if batch else 0)
+            batch.append(segment)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _request_batch(self, batch, from_lang, to_lang):
+        """发送一个打包请求，并将每条译文映射回对应段落"""
+        if len(batch) == 1:
+            result = self._call_api(batch[0], from_lang, to_lang)
+            self._remember(f"{from_lang}:{to_lang}:{batch[0]}", result)
+            return [result]
+
+        result = self._call_api('\n'.join(batch), from_lang, to_lang)
+        if not result.ok:
+            for segment in batch:
+                self._remember(f"{from_lang}:{to_lang}:{segment}", result)
+            return [result] * len(batch)
+        if len(result.items) != len(batch) or any('dst' not in item for item in result.items):
+            # 返回行数与请求不一致（如空行被合并），逐条重新请求
+            logging.warning("批量翻译结果与请求段落数不一致，改为逐条请求")
+            return [self._request_batch([segment], from_lang, to_lang)[0] for segment in batch]
+
+        results = []
+        for segment, item in zip(batch, result.items):
+            segment_result = TranslationResult(item['dst'], result.detected_lang, result.latency, items=[item])
+            self._remember(f"{from_lang}:{to_lang}:{segment}", segment_result)
+            results.append(segment_result)
+        return results
+
+    def _call_api(self, query, from_lang, to_lang):
+        """调用翻译API，返回TranslationResult（items为逐行结果）"""
+        if not self.backend.configured:
+            return TranslationResult.failure("请先配置API密钥", TranslationResult.FATAL)
             
-        except Exception as e:
-            return f"翻译失败: {str(e)}"
+        start = time.monotonic()
+        failure = None
+        for attempt in range(self.retry_policy.max_attempts):
+            if not self.circuit_breaker.allow_request():
+                # 熔断期间直接失败，不再等待超时
+                return failure or TranslationResult.failure(
+                    "翻译失败: 翻译服务暂时不可用，请稍后重试", TranslationResult.TRANSIENT,
+                    latency=time.monotonic() - start)
+            if attempt:
+                time.sleep(self.retry_policy.backoff(attempt))
+            self.rate_limiter.acquire()
+
+            try:
+                self._last_used = time.monotonic()
+                response = self._send_hedged(query, from_lang, to_lang)
+            except Exception as e:
+                if isinstance(e, requests.HTTPError) and e.response is not None:
+                    retryable = self.retry_policy.on_http_status(
+                        e.response.status_code, self.rate_limiter, self.circuit_breaker)
+                else:
+                    retryable = self.retry_policy.is_retryable_exception(e)
+                    if retryable:
+                        self.circuit_breaker.record_failure()
+                    else:
+                        # 请求可能根本没有到达服务，不能据此判断服务已恢复
+                        self.circuit_breaker.release()
+                failure = TranslationResult.failure(
+                    f"翻译失败: {str(e)}",
+                    TranslationResult.TRANSIENT if retryable else TranslationResult.FATAL,
+                    latency=time.monotonic() - start)
+                if not retryable:
+                    return failure
+                logging.warning(f"翻译请求失败，准备重试: {str(e)}")
+                continue
+
+            result = self.backend.to_result(response, time.monotonic() - start)
+            if result.error_code == self.THROTTLE_ERROR_CODE:
+                # 被限流时降速后重新排队，限流不计入熔断
+                self.rate_limiter.on_throttled()
+                self.circuit_breaker.record_success()
+                failure = result
+                continue
+            if self.retry_policy.is_retryable_code(result.error_code):
+                self.circuit_breaker.record_failure()
+                failure = result
+                logging.warning(f"翻译服务暂时错误({result.error_code})，准备重试")
+                continue
+
+            # 成功或不可重试的错误（如签名错误）说明服务本身可用
+            self.rate_limiter.on_success()
+            self.circuit_breaker.record_success()
+            return result
+        return failure
+
+    def _send_hedged(self, query, from_lang, to_lang):
+        """发送请求，响应过慢时发送对冲请求，先返回者胜出
+
+        requests无法中断已发出的请求，落败请求若尚未开始则取消，
+        已发出的则丢弃其响应，连接随后归还连接池
+        """
+        delay = self.latency_tracker.percentile(self.hedge_percentile)
+        with self._hedge_lock:
+            self._hedge_credits = min(self.HEDGE_CREDIT_CAP, self._hedge_credits + self.hedge_ratio)
+        if delay is None:
+            return self._timed_send(self.backend, query, from_lang, to_lang)
+
+        primary = self._hedge_executor.submit(self._timed_send, self.backend, query, from_lang, to_lang)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_hedge_credit():
+            return primary.result()
+
+        logging.info(f"翻译请求超过 {delay:.2f}s 未返回，发送对冲请求")
+        hedge = self._hedge_executor.submit(
+            self._timed_send, self.secondary_backend or self.backend, query, from_lang, to_lang)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+        return primary.result()
+
+    def _take_hedge_credit(self):
+        """对冲请求会额外消耗额度，受比例上限和限流器约束"""
+        with self._hedge_lock:
+            if self._hedge_credits < 1:
+                return False
+            if not self.rate_limiter.acquire(timeout=0):
+                return False
+            self._hedge_credits -= 1
+            return True
+
+    def _timed_send(self, backend, query, from_lang, to_lang):
+        start = time.monotonic()
+        result = backend.send(self.session, query, from_lang, to_lang, self.timeout)
+        self.latency_tracker.record(time.monotonic() - start)
+        return result
+
     def _init_tts(self):
         """初始化语音合成设置"""
         try:
@@ -198,6 +2267,245 @@ class BaiduTranslator:
             self.tts_engine.runAndWait()
         except Exception as e:
             logging.error(f"语音朗读线程执行失败: {str(e)}")
+class AsyncHTTPClient:
+    """基于asyncio流的轻量HTTP/1.1客户端，按主机复用keep-alive连接"""
+    def __init__(self, max_connections=100, timeout=10):
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._idle = {}  # (scheme, host, port) -> 空闲连接列表
+        self._ssl_context = ssl.create_default_context()
+
+    async def request(self, method, url, params=None, data=None):
+        """发送请求，返回 (状态码, 响应体)"""
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or 'http'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+
+        target = parts.path or '/'
+        query = '&'.join(q for q in (parts.query, urllib.parse.urlencode(params or {})) if q)
+        if query:
+            target = f"{target}?{query}"
+        body = urllib.parse.urlencode(data).encode() if data else b''
+        head = (
+            f"{method} {target} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            "User-Agent: Mozilla/5.0\r\n"
+            "Accept: application/json\r\n"
+            "Connection: keep-alive\r\n"
+        )
+        if data:
+            head += "Content-Type: application/x-www-form-urlencoded\r\n"
+        head += f"Content-Length: {len(body)}\r\n\r\n"
+        payload = head.encode('latin-1') + body
+
+        async with self._semaphore:
+            while True:
+                reader, writer, reused = await self._acquire(key)
+                try:
+                    status, response_body, keep_alive = await asyncio.wait_for(
+                        self._exchange(reader, writer, payload), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if reused:
+                        continue  # 复用的连接可能已被服务端关闭，换新连接重试
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                if keep_alive:
+                    self._idle.setdefault(key, []).append((reader, writer))
+                else:
+                    writer.close()
+                return status, response_body
+
+    async def _acquire(self, key):
+        """取出一个空闲连接，没有则新建"""
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                host, port, ssl=self._ssl_context if scheme == 'https' else None),
+            self.timeout)
+        return reader, writer, False
+
+    @staticmethod
+    async def _exchange(reader, writer, payload):
+        """写入请求并读取完整响应"""
+        writer.write(payload)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("连接已关闭")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return status, body, keep_alive
+
+    async def close(self):
+        """关闭所有空闲连接"""
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+class AsyncBaiduTranslator:
+    """基于asyncio的翻译引擎
+
+    事件循环运行在独立的后台线程中，UI和批处理任务通过submit提交协程，
+    大量并发请求无需为每个请求占用一个线程
+    """
+    THROTTLE_ERROR_CODE = BaiduTranslator.THROTTLE_ERROR_CODE
+
+    def __init__(self, appid, appkey, cache=None, max_concurrency=100, backend=None,
+                 tier='standard', qps=None, rate_limiter=None, circuit_breaker=None):
+        self.appid = appid
+        self.appkey = appkey
+        self.backend = backend or BaiduBackend(appid, appkey)
+        self.timeout = 10
+        self.cache = cache if cache is not None else TranslationCache()
+        # 与同一账号的BaiduTranslator共用rate_limiter和circuit_breaker，QPS上限按账号而不是按客户端计算
+        self.rate_limiter = rate_limiter or (RateLimiter(qps=qps) if qps else RateLimiter.for_tier(tier))
+        self.retry_policy = RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._client = AsyncHTTPClient(max_connections=max_concurrency, timeout=self.timeout)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="translate_async_loop", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, coro):
+        """从任意线程提交协程，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def translate(self, query, from_lang='auto', to_lang='zh'):
+        """翻译文本，返回译文或错误信息"""
+        return (await self.translate_result(query, from_lang, to_lang)).text
+
+    async def translate_result(self, query, from_lang='auto', to_lang='zh'):
+        """翻译文本，返回TranslationResult"""
+        if not query or not query.strip():
+            return TranslationResult.failure("请输入要翻译的文本", TranslationResult.FATAL)
+
+        cache_key = f"{from_lang}:{to_lang}:{query}"
+        cached_result = self.cache.get_result(cache_key)
+        if cached_result:
+            return cached_result
+
+        result = await self._call_api(query, from_lang, to_lang)
+        self.cache.set_result(cache_key, result)
+        return result
+
+    async def translate_many(self, segments, from_lang='auto', to_lang='zh'):
+        """并发翻译多段文本，返回与segments一一对应的译文列表"""
+        unique = list(OrderedDict.fromkeys(s for s in segments if s and s.strip()))
+        results = await asyncio.gather(*(self.translate(s, from_lang, to_lang) for s in unique))
+        translated = dict(zip(unique, results))
+        return [translated.get(s, '') for s in segments]
+
+    async def _call_api(self, query, from_lang, to_lang):
+        """调用翻译API，返回TranslationResult
+
+        限流、重试和熔断的处理与BaiduTranslator._call_api一致，等待均在事件循环中进行
+        """
+        if not self.backend.configured:
+            return TranslationResult.failure("请先配置API密钥", TranslationResult.FATAL)
+
+        start = time.monotonic()
+        method, url, params = self.backend.build_request(query, from_lang, to_lang)
+        failure = None
+        for attempt in range(self.retry_policy.max_attempts):
+            if not self.circuit_breaker.allow_request():
+                return failure or TranslationResult.failure(
+                    "翻译失败: 翻译服务暂时不可用，请稍后重试", TranslationResult.TRANSIENT,
+                    latency=time.monotonic() - start)
+            if attempt:
+                await asyncio.sleep(self.retry_policy.backoff(attempt))
+            await self.rate_limiter.acquire_async()
+
+            try:
+                if method == 'POST':
+                    status, body = await self._client.request('POST', url, data=params)
+                else:
+                    status, body = await self._client.request('GET', url, params=params)
+                if status < 400:
+                    response = json.loads(body)
+            except Exception as e:
+                # 连接失败、超时等网络错误
+                self.circuit_breaker.record_failure()
+                failure = TranslationResult.failure(f"翻译失败: {str(e) or type(e).__name__}",
+                                                    TranslationResult.TRANSIENT, latency=time.monotonic() - start)
+                logging.warning(f"翻译请求失败，准备重试: {str(e) or type(e).__name__}")
+                continue
+
+            if status >= 400:
+                retryable = self.retry_policy.on_http_status(status, self.rate_limiter, self.circuit_breaker)
+                failure = TranslationResult.failure(
+                    f"翻译失败: HTTP {status}",
+                    TranslationResult.TRANSIENT if retryable else TranslationResult.FATAL,
+                    latency=time.monotonic() - start)
+                if not retryable:
+                    return failure
+                logging.warning(f"翻译服务返回HTTP {status}，准备重试")
+                continue
+
+            result = self.backend.to_result(response, time.monotonic() - start)
+            if result.error_code == self.THROTTLE_ERROR_CODE:
+                self.rate_limiter.on_throttled()
+                self.circuit_breaker.record_success()
+                failure = result
+                continue
+            if self.retry_policy.is_retryable_code(result.error_code):
+                self.circuit_breaker.record_failure()
+                failure = result
+                logging.warning(f"翻译服务暂时错误({result.error_code})，准备重试")
+                continue
+
+            self.rate_limiter.on_success()
+            self.circuit_breaker.record_success()
+            return result
+        return failure
+
+    def close(self):
+        """关闭连接并停止事件循环"""
+        if self._loop.is_closed():
+            return
+        self.submit(self._client.close()).result(timeout=self.timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=self.timeout)
+        self._loop.close()
+
 class TextFormatter:
     """文本格式化工具"""
     @staticmethod
@@ -222,4 +2530,85 @@ class TextFormatter:
             # 每句换行
             sentences = text.split("。")
             return "。\n".join(s.strip() for s in sentences if s.strip())
-        return text
\ No newline at end of file
+        return text
+class TextChunker:
+    """按段落和句子边界切分长文本"""
+    # 句末标点（中英文），英文句点后需跟空白，避免切开小数和缩写
+    SENTENCE_PATTERN = re.compile(r'.+?(?:[。！？!?；;…]+[”’"\'）)]*|\.(?=\s)|$)\s*', re.S)
+
+    @classmethod
+    def split(cls, text, max_bytes, merge=True):
+        """切分文本，返回 (片段, 分隔符) 列表
+
+        所有片段与分隔符按顺序拼接即为原文，每个片段的UTF-8长度不超过max_bytes；
+        merge为False时不合并相邻段落，每个段落（或超长段落的句段）单独成片
+        """
+        units = []
+        for paragraph, separator in cls._split_paragraphs(text):
+            if cls._size(paragraph) <= max_bytes:
+                units.append((paragraph, separator))
+                continue
+            pieces = cls._split_sentences(paragraph, max_bytes)
+            pieces[-1] = (pieces[-1][0], pieces[-1][1] + separator)
+            units.extend(pieces)
+        if not merge:
+            return units
+        return cls.merge(units, max_bytes)
+
+    @classmethod
+    def merge(cls, units, max_bytes):
+        """将相邻片段合并为不超过max_bytes的大片段"""
+        chunks = []
+        for unit, separator in units:
+            if chunks:
+                last, last_separator = chunks[-1]
+                if cls._size(last + last_separator + unit) <= max_bytes:
+                    chunks[-1] = (last + last_separator + unit, separator)
+                    continue
+            chunks.append((unit, separator))
+        return chunks
+
+    @staticmethod
+    def _split_paragraphs(text):
+        """按换行切分段落，换行保留为分隔符，文本开头的空行作为首段的前缀"""
+        parts = re.split(r'(\s*\n\s*)', text)
+        paragraphs = []
+        prefix = ''
+        for index in range(0, len(parts), 2):
+            separator = parts[index + 1] if index + 1 < len(parts) else ''
+            if parts[index]:
+                paragraphs.append((prefix + parts[index], separator))
+                prefix = ''
+            elif paragraphs:
+                paragraphs[-1] = (paragraphs[-1][0], paragraphs[-1][1] + separator)
+            else:
+                prefix += separator
+        if prefix:
+            # 全部为空白
+            paragraphs.append(('', prefix))
+        return paragraphs
+
+    @classmethod
+    def _split_sentences(cls, paragraph, max_bytes):
+        """按句末标点切分段落，超长句子再按字节数硬切"""
+        pieces = []
+        for sentence in cls.SENTENCE_PATTERN.findall(paragraph):
+            body = sentence.rstrip()
+            separator = sentence[len(body):]
+            if not body:
+                continue
+            while cls._size(body) > max_bytes:
+                head = cls._truncate(body, max_bytes)
+                pieces.append((head, ''))
+                body = body[len(head):]
+            pieces.append((body, separator))
+        return pieces
+
+    @staticmethod
+    def _truncate(text, max_bytes):
+        """截取不超过max_bytes字节的前缀，不切断多字节字符"""
+        return text.encode('utf-8')[:max_bytes].decode('utf-8', errors='ignore')
+
+    @staticmethod
+    def _size(text):
+        return len(text.encode('utf-8'))
@@ -13,7 +13,8 @@ import time
 import pyautogui
 from collections import OrderedDict
 
-from translator import BaiduTranslator, TextFormatter
+from translator import BaiduTranslator, TextFormatter, TranslationCache, DiskCache, SnapshotCache, TranslationMemory
+from settings_manager import HistorySearch, HistoryPageSource, HistoryListSource
 class BaseUIComponent:
     def __init__(self, parent, settings_manager):
         self.parent = parent
@@ -306,6 +307,12 @@ class TranslateTabManager(BaseUIComponent):
         button_grid.columnconfigure(4, weight=1)
 
 class ConfigTabManager(BaseUIComponent):
+    API_TIER_MAP = {
+        '标准版': 'standard',
+        '高级版': 'advanced',
+        '尊享版': 'premium'
+    }
+
     def __init__(self, notebook, settings_manager):
         super().__init__(notebook, settings_manager)
         self.notebook = notebook
@@ -313,6 +320,7 @@ class ConfigTabManager(BaseUIComponent):
         self.theme_var = None
         self.appid_entry = None
         self.appkey_entry = None
+        self.api_tier_var = None
         self.translate_shortcut = None
         self.clear_shortcut = None
         self.capture_shortcut = None
@@ -384,6 +392,27 @@ class ConfigTabManager(BaseUIComponent):
         self.appkey_entry = tb.Entry(key_frame, show="*", bootstyle=PRIMARY, font=('微软雅黑', 10))
         self.appkey_entry.pack(side=LEFT, fill=X, expand=True)
 
+        # 账号版本决定请求频率上限(QPS)
+        tier_frame = tb.Frame(api_frame)
+        tier_frame.pack(fill=X, pady=(5, 0))
+        tb.Label(tier_frame, text="账号版本:", width=10).pack(side=LEFT)
+        self.api_tier_var = tb.StringVar(value='标准版')
+        tier_combo = tb.Combobox(tier_frame, textvariable=self.api_tier_var,
+                                width=10, state="readonly", bootstyle=PRIMARY)
+        tier_combo['values'] = list(self.API_TIER_MAP.keys())
+        tier_combo.pack(side=LEFT)
+
+    def get_api_tier(self):
+        """获取选中的账号版本代码"""
+        return self.API_TIER_MAP.get(self.api_tier_var.get(), 'standard')
+
+    def set_api_tier(self, tier):
+        """根据账号版本代码设置下拉框"""
+        for name, code in self.API_TIER_MAP.items():
+            if code == tier:
+                self.api_tier_var.set(name)
+                break
+
     def _create_shortcut_settings(self, parent):
         """创建快捷键设置区域"""
         shortcuts_frame = tb.LabelFrame(parent, text="快捷键设置", padding=8, bootstyle=INFO)
@@ -578,15 +607,171 @@ class AboutTabManager(BaseUIComponent):
         tb.Label(total_frame,
                 text=f"{stats['total_translations']}次 ({stats['total_characters']}字)",
                 font=('微软雅黑', 10, 'bold')).pack(side=LEFT)
+class VirtualListView:
+    """只创建可见行的Treeview列表
+
+    数据由source提供（count()、rows(start, stop)、get(key)），Treeview中只保留
+    可见范围加少量预留的行，滚动时复用这些行并更新内容，
+    打开和滚动的开销与数据总量无关
+    """
+    OVERSCAN = 5  # 可见范围之外额外创建的行数
+    DEFAULT_ROW_HEIGHT = 20
+
+    def __init__(self, parent, columns, row_values):
+        self.row_values = row_values  # 记录 -> 行的values
+        self.source = None
+        self.first = 0  # 第一个可见行在数据中的位置
+        self._count = 0
+        self._visible = 20
+        self._row_keys = {}  # 行iid -> 记录的键
+        self._selected_key = None
+        self.tree = tb.Treeview(parent, columns=columns, show='headings', selectmode='browse')
+        self.scrollbar = tb.Scrollbar(parent, orient=VERTICAL, command=self._on_scrollbar)
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(3))
+        self.tree.bind('<Up>', lambda e: self._move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self._move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self._move_selection(-self._visible))
+        self.tree.bind('<Next>', lambda e: self._move_selection(self._visible))
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+
+    def set_source(self, source):
+        """更换数据源并回到顶部"""
+        self.source = source
+        self.first = 0
+        self._selected_key = None
+        self.refresh()
+
+    def refresh(self):
+        """按当前位置重新读取可见行"""
+        self._count = self.source.count() if self.source else 0
+        self.first = max(0, min(self.first, self._count - self._visible))
+        rows = self.source.rows(self.first, self.first + self._visible + self.OVERSCAN) if self._count else []
+        items = self.tree.get_children()
+        self._row_keys = {}
+        selected = None
+        for i, (key, record) in enumerate(rows):
+            if i < len(items):
+                iid = items[i]
+                self.tree.item(iid, values=self.row_values(record))
+            else:
+                iid = self.tree.insert('', 'end', values=self.row_values(record))
+            self._row_keys[iid] = key
+            if key == self._selected_key:
+                selected = iid
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+        self.tree.selection_set((selected,) if selected else ())
+        self.tree.yview_moveto(0)
+        self._update_scrollbar()
+
+    def row_inserted(self, position):
+        """数据源在position处新增一行后更新列表
+
+        位于顶部时只插入这一行并删除超出预留范围的末行，位于可见范围之前时保持当前内容不动
+        """
+        self._count = self.source.count()
+        if position < self.first or (position == self.first and self.first > 0):
+            self.first += 1
+        elif position == 0:
+            key, record = self.source.rows(0, 1)[0]
+            iid = self.tree.insert('', 0, values=self.row_values(record))
+            self._row_keys[iid] = key
+            items = self.tree.get_children()
+            if len(items) > self._visible + self.OVERSCAN:
+                self.tree.delete(*items[self._visible + self.OVERSCAN:])
+                for evicted in items[self._visible + self.OVERSCAN:]:
+                    self._row_keys.pop(evicted, None)
+            self.tree.yview_moveto(0)
+        else:
+            self.refresh()
+            return
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        if self._count:
+            self.scrollbar.set(self.first / self._count, min(1.0, (self.first + self._visible) / self._count))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll(self, rows):
+        self.first += rows
+        self.refresh()
+        return 'break'
+
+    def selected_key(self):
+        """返回选中行对应记录的键"""
+        selection = self.tree.selection()
+        return self._row_keys.get(selection[0]) if selection else None
+
+    def _move_selection(self, delta):
+        """键盘移动选中行，超出可见范围时滚动"""
+        keys = [self._row_keys[iid] for iid in self.tree.get_children()]
+        if self._selected_key in keys:
+            index = self.first + keys.index(self._selected_key)
+        else:
+            index = self.first - 1 if delta > 0 else self.first
+        index = max(0, min(index + delta, self._count - 1))
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + self._visible:
+            self.first = index - self._visible + 1
+        row = self.source.rows(index, index + 1) if self._count else []
+        if row:
+            self._selected_key = row[0][0]
+        self.refresh()
+        return 'break'
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self._selected_key = self._row_keys.get(selection[0])
+
+    def _on_configure(self, event):
+        row_height = tb.Style().lookup('Treeview', 'rowheight')
+        try:
+            row_height = int(row_height)
+        except (TypeError, ValueError):
+            row_height = self.DEFAULT_ROW_HEIGHT
+        # 减去表头占用的一行
+        visible = max(1, event.height // row_height - 1)
+        if visible != self._visible:
+            self._visible = visible
+            self.refresh()
+
+    def _on_mousewheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self.first = int(float(value) * self._count)
+            self.refresh()
+        elif unit == 'pages':
+            self.scroll(int(value) * self._visible)
+        else:
+            self.scroll(int(value))
+
 class HistoryTabManager(BaseUIComponent):
+    PREVIEW_LENGTH = 100  # 列表中原文和译文显示的字符数
+    SEARCH_LIMIT = 200  # 搜索返回的最多条数
+    SEARCH_DELAY = 250  # 输入停顿该毫秒数后才开始搜索
+
     def __init__(self, notebook, settings_manager):
         super().__init__(notebook, settings_manager)
         self.notebook = notebook
         self.settings_manager = settings_manager
         self.history_list = None
+        self.history_view = None
+        self.page_source = HistoryPageSource(settings_manager.history_store, self.PREVIEW_LENGTH)
         self.clear_btn = None
         self.search_var = None
         self.search_entry = None
+        self.search_engine = HistorySearch(settings_manager.history_store, self.SEARCH_LIMIT)
+        self._search_after = None
+        # 搜索在后台线程执行，单个线程保证按输入顺序处理
+        self._search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history_search")
         
     def setup(self):
         """设置历史记录标签页"""
@@ -636,10 +821,14 @@ class HistoryTabManager(BaseUIComponent):
         list_container.rowconfigure(0, weight=1)
         list_container.columnconfigure(0, weight=1)
 
-        # 创建历史记录列表
-        self.history_list = tb.Treeview(list_container, 
-                                      columns=('time', 'source', 'target', 'from_lang', 'to_lang'),
-                                      show='headings')
+        # 创建历史记录列表，只创建可见的行
+        self.history_view = VirtualListView(
+            list_container,
+            ('time', 'source', 'target', 'from_lang', 'to_lang'),
+            lambda item: (item['time'], item['source_text'], item['target_text'],
+                          item['from_lang'], item['to_lang'])
+        )
+        self.history_list = self.history_view.tree
         
         # 设置列标题和宽度
         self.history_list.heading('time', text='时间')
@@ -655,29 +844,35 @@ class HistoryTabManager(BaseUIComponent):
         self.history_list.column('from_lang', width=80, minwidth=60)
         self.history_list.column('to_lang', width=80, minwidth=60)
         
-        # 添加滚动条
-        v_scrollbar = tb.Scrollbar(list_container, orient=VERTICAL, command=self.history_list.yview)
+        # 添加滚动条，垂直滚动条由列表按数据总量控制
+        v_scrollbar = self.history_view.scrollbar
         h_scrollbar = tb.Scrollbar(list_container, orient=HORIZONTAL, command=self.history_list.xview)
-        self.history_list.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.history_list.configure(xscrollcommand=h_scrollbar.set)
         
         # 布局滚动条和列表
         self.history_list.grid(row=0, column=0, sticky="nsew")
         v_scrollbar.grid(row=0, column=1, sticky="ns")
         h_scrollbar.grid(row=1, column=0, sticky="ew")
         
-        # 绑定双击事件
+        # 绑定双击和删除键事件
         self.history_list.bind('<Double-Button-1>', self._show_details)
+        self.history_list.bind('<Delete>', self._delete_selected)
         
+        # 历史记录变更时只更新受影响的行
+        self.settings_manager.history_store.subscribe(self._on_history_changed)
         self.load_history()
 
     def _show_details(self, event):
         """显示详细信息"""
-        selection = self.history_list.selection()
-        if not selection:
+        key = self.history_view.selected_key()
+        if key is None:
             return
-                
-        item = self.history_list.item(selection[0])
-        values = item['values']
+        # 列表中只有预览，完整记录在打开详情时读取
+        record = self.history_view.source.get(key)
+        if record is None:
+            return
+        values = (record['time'], record['source_text'], record['target_text'],
+                  record['from_lang'], record['to_lang'])
         
         # 创建详情窗口
         detail_window = tb.Toplevel(self.notebook)
@@ -757,40 +952,74 @@ class HistoryTabManager(BaseUIComponent):
         self.notebook.clipboard_append(text)
 
     def _on_search(self, *args):
-        """处理搜索事件"""
-        search_text = self.search_var.get().lower()
-        self.history_list.delete(*self.history_list.get_children())
-        
-        history = self.settings_manager.load_translation_history()
-        for item in history.values():
-            if (search_text in item['source_text'].lower() or 
-                search_text in item['target_text'].lower()):
-                self.history_list.insert('', 'end', values=(
-                    item['time'],
-                    item['source_text'],
-                    item['target_text'],
-                    item['from_lang'],
-                    item['to_lang']
-                ))
+        """处理搜索事件，连续输入时只在停顿后搜索一次"""
+        if self._search_after is not None:
+            self.notebook.after_cancel(self._search_after)
+        self._search_after = self.notebook.after(self.SEARCH_DELAY, self._start_search)
+
+    def _start_search(self):
+        """开始新搜索，之前尚未完成的搜索作废"""
+        self._search_after = None
+        search_text = self.search_var.get().strip()
+        generation = self.search_engine.next_generation()
+        if not search_text:
+            self.load_history()
+            return
+        self._search_executor.submit(self._search_thread, search_text, generation)
+
+    def _search_thread(self, search_text, generation):
+        """后台执行搜索"""
+        try:
+            results = self.search_engine.search(search_text, generation)
+        except Exception as e:
+            logging.error(f"搜索历史记录失败: {str(e)}")
+            return
+        if results is not None:
+            self.notebook.after(0, self._show_search_results, generation, results)
+
+    def _show_search_results(self, generation, results):
+        """显示搜索结果，期间已开始新搜索时丢弃"""
+        if not self.search_engine.is_current(generation):
+            return
+        self.history_view.set_source(
+            HistoryListSource(self.settings_manager.history_store, results, self.PREVIEW_LENGTH))
 
     def load_history(self):
-        """加载历史记录"""
-        self.history_list.delete(*self.history_list.get_children())
-        history = self.settings_manager.load_translation_history()
-        for item in history.values():
-            self.history_list.insert('', 'end', values=(
-                item['time'],
-                item['source_text'],
-                item['target_text'],
-                item['from_lang'],
-                item['to_lang']
-            ))
+        """加载历史记录，最新的在前"""
+        self.history_view.set_source(self.page_source)
+
+    def _on_history_changed(self, action, version, key, record):
+        """历史记录变更通知，可能来自其他线程，转到界面线程处理"""
+        self.notebook.after(0, self._apply_history_change, action, version, key, record)
+
+    def _apply_history_change(self, action, version, key, record):
+        """将历史记录的变更应用到列表"""
+        position = self.page_source.apply(action, version, key, record)
+        if self.history_view.source is self.page_source:
+            if position is not None:
+                self.history_view.row_inserted(position)
+            else:
+                self.history_view.refresh()
+            return
+        # 显示搜索结果时，新增的记录可能匹配搜索条件，重新搜索
+        self.history_view.source.apply(action, version, key, record)
+        if action == 'add':
+            self._on_search()
+        else:
+            self.history_view.refresh()
+
+    def _delete_selected(self, event=None):
+        """删除选中的历史记录"""
+        key = self.history_view.selected_key()
+        if key is None:
+            return
+        if Messagebox.yesno("确认", "确定要删除选中的历史记录吗？"):
+            self.settings_manager.delete_translation_history(key)
 
     def clear_history(self):
         """清空历史记录"""
         if Messagebox.yesno("确认", "确定要清空所有历史记录吗？"):
             self.settings_manager.save_translation_history({})
-            self.load_history()
     def _on_export_selected(self, event):
         """处理导出格式选择"""
         try:
@@ -944,6 +1173,9 @@ class HistoryTabManager(BaseUIComponent):
             logging.error(f"导出JSON失败: {str(e)}")
             Messagebox.show_error("错误", f"导出JSON失败: {str(e)}")
 class UIManager:
+    # 设为0~1之间的值后，翻译记忆中相似度不低于该值的译文作为标明相似度的建议显示；默认不启用
+    FUZZY_MATCH_THRESHOLD = None
+
     def __init__(self, root, settings_manager):
         self.root = root
         self.settings_manager = settings_manager
@@ -959,6 +1191,8 @@ class UIManager:
         self.config_tab_manager = None
         self.about_tab_manager = None
         self.translator = None
+        self.translation_cache = None
+        self.translation_memory = None
         self.history_tab_manager = None
         self.stats_manager = StatsManager(settings_manager)
         self.setup_ui()
@@ -1079,6 +1313,7 @@ class UIManager:
             # 保存API配置
             appid = self.config_tab_manager.appid_entry.get().strip()
             appkey = self.config_tab_manager.appkey_entry.get().strip()
+            api_tier = self.config_tab_manager.get_api_tier()
             
             # 保存快捷键配置
             shortcuts = {
@@ -1101,10 +1336,8 @@ class UIManager:
             target_lang = self.translate_tab_manager.target_lang.get()
 
             # 保存所有配置
-            if self.settings_manager.save_all_config(appid, appkey, shortcuts, theme, source_lang, target_lang, format_type, export_format):
-                self.translator = BaiduTranslator(appid, appkey)
-                # 设置保存回调
-                self.translator.cache.save_callback = self.settings_manager.save_translation_history
+            if self.settings_manager.save_all_config(appid, appkey, shortcuts, theme, source_lang, target_lang, format_type, export_format, api_tier):
+                self._create_translator(appid, appkey, api_tier)
                 Messagebox.show_info("成功", "配置已保存")
         except Exception as e:
             logging.error(f"保存配置失败: {str(e)}")
@@ -1126,15 +1359,52 @@ class UIManager:
                 self.config_tab_manager.appid_entry.insert(0, appid)
                 self.config_tab_manager.appkey_entry.delete(0, "end")
                 self.config_tab_manager.appkey_entry.insert(0, appkey)
-                self.translator = BaiduTranslator(appid, appkey)
-                # 设置保存回调
-                self.translator.cache.save_callback = self.settings_manager.save_translation_history
+                api_tier = self.settings_manager.load_api_tier()
+                self.config_tab_manager.set_api_tier(api_tier)
+                self._create_translator(appid, appkey, api_tier)
             
             # 加载其他配置
             self._load_remaining_configs()
         except Exception as e:
             logging.error(f"加载配置失败: {str(e)}")
             Messagebox.show_error("错误", f"加载配置失败: {str(e)}")
+
+    def _build_translation_memory(self):
+        """将缓存和最近的历史记录导入翻译记忆"""
+        try:
+            history = self.settings_manager.load_translation_history(self.translation_memory.max_entries)
+            records = list(history.values())
+            count = self.translation_memory.load_cache(self.translation_cache)
+            count += self.translation_memory.load_history(records, LanguageMapper.get_lang_code)
+            logging.info(f"翻译记忆已加载 {count} 条记录")
+        except Exception as e:
+            logging.error(f"加载翻译记忆失败: {str(e)}")
+
+    def _create_translator(self, appid, appkey, api_tier):
+        """创建翻译器"""
+        if self.translator:
+            self.translator.close()
+        if self.translation_cache is None:
+            # 磁盘缓存在重建翻译器时保留，程序重启后仍可命中之前的翻译
+            self.translation_cache = TranslationCache(
+                disk=DiskCache(self.settings_manager.cache_file),
+                snapshot=SnapshotCache(self.settings_manager.snapshot_file),
+                preload=False
+            )
+            # 在后台从磁盘缓存预热，不阻塞界面
+            self.thread_pool.submit(self.translation_cache.warm_up)
+            # 定期将本实例的翻译合并进共享快照，供其他实例使用
+            self.translation_cache.start_compaction()
+            # 翻译记忆的索引占用大量内存和CPU，只在启用近似匹配时建立
+            if self.FUZZY_MATCH_THRESHOLD is not None:
+                self.translation_memory = TranslationMemory()
+        # 后台预热连接，避免首次翻译承担握手延迟
+        self.translator = BaiduTranslator(appid, appkey, tier=api_tier, prewarm=True,
+                                          cache=self.translation_cache,
+                                          memory=self.translation_memory,
+                                          fuzzy_threshold=self.FUZZY_MATCH_THRESHOLD)
+        # 设置保存回调
+        self.translator.cache.save_callback = self.settings_manager.append_translation_history
     def _load_remaining_configs(self):
         """加载剩余配置"""
         try:
@@ -1170,8 +1440,11 @@ class UIManager:
 
             # 加载历史记录到缓存
             if self.translator:
-                history = self.settings_manager.load_translation_history()
+                history = self.settings_manager.load_translation_history(self.translator.cache._max_history)
                 self.translator.cache._history = OrderedDict(history)
+                # 后台用缓存和历史记录建立翻译记忆
+                if self.translation_memory is not None:
+                    self.thread_pool.submit(self._build_translation_memory)
 
             logging.info("配置加载完成")
         except Exception as e:
@@ -1219,14 +1492,42 @@ class UIManager:
             from_lang = LanguageMapper.get_lang_code(self.translate_tab_manager.source_lang.get())
             to_lang = LanguageMapper.get_lang_code(self.translate_tab_manager.target_lang.get())
             
-            result = self.translator.translate(source_text, from_lang=from_lang, to_lang=to_lang)
+            # 逐段显示译文，先到先显示
+            self.root.after(0, self._clear_result)
+            parts = []
+            for part in self.translator.translate_stream(source_text, from_lang=from_lang, to_lang=to_lang):
+                if not part.ok:
+                    # 翻译失败只显示错误信息，不计入统计和历史记录
+                    logging.warning(f"翻译失败({part.error_class}): {part.text}")
+                    self.root.after(0, self._clear_result)
+                    self.root.after(0, self._append_result, part.text)
+                    return
+                text = part.text
+                if part.fuzzy:
+                    # 近似译文可能与原文含义不同（如否定、数字），明确标为建议
+                    text = f"[翻译记忆建议，相似度{part.match_score:.0%}，请核对] {text}"
+                parts.append(text)
+                self.root.after(0, self._append_result, text)
             
-            self.root.after(0, self._update_result, result)
+            self.root.after(0, self._update_result, ''.join(parts))
         except Exception as e:
             ErrorHandler.handle_error(e, "翻译")
         finally:
             self.root.after(0, self._set_controls_state, 'normal')
 
+    def _clear_result(self):
+        """清空译文区域，准备接收流式结果"""
+        self.translate_tab_manager.target_text.text.configure(state='normal')
+        self.translate_tab_manager.target_text.text.delete("1.0", "end")
+        self.translate_tab_manager.target_text.text.configure(state='disabled')
+
+    def _append_result(self, part):
+        """追加一段译文"""
+        self.translate_tab_manager.target_text.text.configure(state='normal')
+        self.translate_tab_manager.target_text.text.insert("end", part)
+        self.translate_tab_manager.target_text.text.see("end")
+        self.translate_tab_manager.target_text.text.configure(state='disabled')
+
     def _update_result(self, result):
         """更新翻译结果"""
         try:
@@ -1247,11 +1548,8 @@ class UIManager:
             # 添加到历史记录
             from_lang = self.translate_tab_manager.source_lang.get()
             to_lang = self.translate_tab_manager.target_lang.get()
+            # 历史记录列表由存储的变更通知更新
             self.translator.cache.add_to_history(source_text, formatted_result, from_lang, to_lang)
-            
-            # 更新历史记录显示
-            if self.history_tab_manager:
-                self.history_tab_manager.load_history()
 
             logging.info("翻译操作完成")
         except Exception as e:
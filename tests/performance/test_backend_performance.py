@@ -0,0 +1,26 @@
+# tests/performance/test_backend_performance.py
+import unittest
+import time
+from src.translator import AsyncBaiduTranslator, LocalTranslationServer
+
+class TestBackendPerformance(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalTranslationServer().start()
+        self.translator = AsyncBaiduTranslator("test_appid", "test_appkey", backend=self.server.backend(),
+                                               qps=10000)
+    
+    def tearDown(self):
+        self.translator.close()
+        self.server.stop()
+    
+    def test_concurrent_requests_against_local_backend(self):
+        segments = [f"segment {i}" for i in range(1000)]
+        
+        start_time = time.time()
+        future = self.translator.submit(self.translator.translate_many(segments, "en", "zh"))
+        results = future.result(timeout=30)
+        end_time = time.time()
+        
+        self.assertEqual(results[42], "[zh]segment 42")
+        self.assertEqual(self.server.request_count, 1000)
+        self.assertLess(end_time - start_time, 5)  # 应在5秒内完成
@@ -1,6 +1,7 @@
 # tests/performance/test_cache_performance.py
 import unittest
 import time
+import threading
 from src.translator import TranslationCache
 
 class TestCachePerformance(unittest.TestCase):
@@ -15,4 +16,87 @@ class TestCachePerformance(unittest.TestCase):
             cache.get(f"key{i}")
         
         end_time = time.time()
-        self.assertLess(end_time - start_time, 1)  # 应在1秒内完成
\ No newline at end of file
+        self.assertLess(end_time - start_time, 1)  # 应在1秒内完成
+
+    def _measure_throughput(self, cache, thread_count, operations=4000):
+        """多个线程同时读写缓存，返回每秒完成的操作数"""
+        barrier = threading.Barrier(thread_count + 1)
+
+        def worker(worker_id):
+            barrier.wait()
+            for i in range(operations):
+                key = f"en:zh:{(worker_id * 7919 + i) % 5000}"
+                if i % 4 == 0:
+                    cache.set(key, f"value{i}")
+                else:
+                    cache.get(key)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return thread_count * operations / (time.perf_counter() - start_time)
+
+    def test_cache_contention(self):
+        # 同样8个线程下比较单分片与16分片，交替测量3轮取最好成绩以减少机器负载的影响
+        best = {1: 0, 16: 0}
+        for _ in range(3):
+            for shards in best:
+                cache = TranslationCache(max_size=20000, timeout=3600, shards=shards)
+                best[shards] = max(best[shards], self._measure_throughput(cache, 8))
+                cache.close()
+        # 受GIL限制分片不会让吞吐量成倍增长，这里只检查分片后并发读写不比单锁明显退化
+        ratio = best[16] / best[1]
+        self.assertGreater(ratio, 0.5, f"8线程下16分片的吞吐量为单分片的 {ratio:.2f} 倍")
+
+    def test_held_shard_does_not_block_other_keys(self):
+        cache = TranslationCache(max_size=20000, timeout=3600, shards=16)
+        keys = [f"en:zh:{i}" for i in range(64)]
+        for key in keys:
+            cache.set(key, "value")
+        busy = cache._shard(cache._digest(keys[0]))
+        others = [key for key in keys if cache._shard(cache._digest(key)) is not busy]
+        self.assertTrue(others)
+
+        # 模拟一个分片上的慢操作，其他分片的键仍可立即读取
+        lookups = threading.Thread(target=lambda: [cache.get(key) for key in others])
+        with busy.lock:
+            lookups.start()
+            lookups.join(timeout=1)
+            self.assertFalse(lookups.is_alive())
+        cache.close()
+
+    def test_history_save_does_not_block_lookups(self):
+        cache = TranslationCache(max_size=1000)
+        cache.set("en:zh:hello", "你好")
+
+        def slow_save(key, record):
+            time.sleep(0.5)
+
+        saver = threading.Thread(
+            target=cache.add_to_history, args=("hello", "你好", "en", "zh", slow_save))
+        saver.start()
+        time.sleep(0.05)
+        start_time = time.perf_counter()
+        self.assertEqual(cache.get("en:zh:hello"), "你好")
+        self.assertLess(time.perf_counter() - start_time, 0.1)
+        saver.join()
+
+    def test_history_saves_do_not_queue_behind_each_other(self):
+        cache = TranslationCache(max_size=1000)
+
+        def slow_save(key, record):
+            time.sleep(0.3)
+
+        savers = [threading.Thread(target=cache.add_to_history, args=(f"text{i}", "译文", "en", "zh", slow_save))
+                  for i in range(4)]
+        start_time = time.perf_counter()
+        for saver in savers:
+            saver.start()
+        for saver in savers:
+            saver.join()
+        # 写入由HistoryStore自行串行化，缓存不应再让翻译线程排队等待保存
+        self.assertLess(time.perf_counter() - start_time, 0.9)
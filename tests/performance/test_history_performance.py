@@ -0,0 +1,74 @@
+# tests/performance/test_history_performance.py
+import unittest
+import os
+import random
+import tempfile
+import time
+from src.settings_manager import HistoryStore, HistoryPageSource
+
+class TestHistoryPerformance(unittest.TestCase):
+    RECORDS = 100000
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.store = HistoryStore(os.path.join(cls.temp_dir.name, 'history.db'))
+        words = ["translation", "network", "cache", "memory", "history", "window",
+                 "翻译", "网络", "缓存", "历史", "窗口", "设置"]
+        rng = random.Random(0)
+        batch = []
+        for i in range(cls.RECORDS):
+            source = " ".join(rng.choice(words) for _ in range(8)) + f" #{i}"
+            batch.append((f"key{i}", {'source_text': source, 'target_text': source[::-1],
+                                      'from_lang': '英语', 'to_lang': '中文',
+                                      'time': '2024-01-01 00:00:00'}))
+            if len(batch) == 10000:
+                cls.store.add_many(batch)
+                batch = []
+        cls.store.add_many(batch)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.store.close()
+        cls.temp_dir.cleanup()
+
+    def test_search_returns_top_matches_quickly(self):
+        for query in ("network cache", "缓存 历史", "#19999"):
+            start_time = time.perf_counter()
+            results = self.store.search(query, limit=200)
+            elapsed = time.perf_counter() - start_time
+            self.assertTrue(results)
+            self.assertLess(elapsed, 0.05)  # 应在50毫秒内完成
+
+    def test_short_queries_use_index(self):
+        # 两个字符的中文词最常见，trigram索引无法处理，不应退回全表扫描
+        for query in ("缓存", "网缓", "#1", "翻"):
+            start_time = time.perf_counter()
+            self.store.search(query, limit=200)
+            elapsed = time.perf_counter() - start_time
+            self.assertLess(elapsed, 0.05, query)  # 应在50毫秒内完成
+        self.assertEqual(len(self.store.search("缓存", limit=200)), 200)
+
+    def test_scrolling_cost_does_not_grow_with_depth(self):
+        source = HistoryPageSource(self.store)
+        self.assertEqual(source.count(), self.RECORDS)
+        # 拖动滚动条跳到末尾，之后逐页滚动
+        source.rows(self.RECORDS - 1000, self.RECORDS - 990)
+        start_time = time.perf_counter()
+        for start in range(self.RECORDS - 900, self.RECORDS, 100):
+            self.assertEqual(len(source.rows(start, start + 30)), 30)
+        self.assertLess((time.perf_counter() - start_time) / 9, 0.005)  # 每页应在5毫秒内读取
+
+    def test_scrollbar_jumps_do_not_scan_skipped_rows(self):
+        source = HistoryPageSource(self.store)
+        rng = random.Random(1)
+        # 拖动滚动条在任意位置间跳转，每次只读取目标页
+        positions = [self.RECORDS - 30] + [rng.randrange(self.RECORDS - 30) for _ in range(20)]
+        elapsed = []
+        for start in positions:
+            start_time = time.perf_counter()
+            self.assertEqual(len(source.rows(start, start + 30)), 30)
+            elapsed.append(time.perf_counter() - start_time)
+        # OFFSET逐行跳过的代价随位置线性增长，10万条时跳到末尾就需十几毫秒
+        self.assertLess(max(elapsed), 0.01)
+        self.assertLess(sum(elapsed) / len(elapsed), 0.003)
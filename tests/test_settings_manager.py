@@ -2,8 +2,9 @@ import unittest
 from unittest.mock import Mock, patch
 import os
 import tempfile
+import json
 import ttkbootstrap as tb
-from src.settings_manager import ConfigManager, ThemeManager, SettingsManager
+from src.settings_manager import ConfigManager, ThemeManager, SettingsManager, HistoryStore, HistorySearch, HistoryPageSource, HistoryListSource
 
 class TestConfigManager(unittest.TestCase):
     def setUp(self):
@@ -28,6 +29,225 @@ class TestThemeManager(unittest.TestCase):
         theme_manager.set_theme("黑夜")
         mock_set_theme.assert_called_once_with("黑夜")
 
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(os.path.join(self.temp_dir.name, 'history.db'))
+    
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+    
+    def _record(self, source, target, from_lang='英语', to_lang='中文'):
+        return {'source_text': source, 'target_text': target, 'from_lang': from_lang,
+                'to_lang': to_lang, 'time': '2024-01-01 00:00:00'}
+    
+    def test_add_and_load(self):
+        for i in range(5):
+            self.store.add(f"key{i}", self._record(f"text{i}", f"文本{i}"))
+        self.store.add("key1", self._record("text1", "更新"))
+        self.assertEqual(self.store.count(), 5)
+        self.assertEqual(list(self.store.load()), [f"key{i}" for i in range(5)])
+        self.assertEqual(list(self.store.load(limit=2)), ["key3", "key4"])
+        self.assertEqual(self.store.load()["key1"]['target_text'], "更新")
+    
+    def test_search_matches_substrings_newest_first(self):
+        self.store.add("a", self._record("Hello World", "你好世界"))
+        self.store.add("b", self._record("Say hello", "打个招呼"))
+        self.store.add("c", self._record("Goodbye", "再见"))
+        self.assertEqual([key for key, _ in self.store.search("HELLO")], ["b", "a"])
+        self.assertEqual([key for key, _ in self.store.search("世界")], ["a"])
+        self.assertEqual([key for key, _ in self.store.search("你好世")], ["a"])
+        self.assertEqual([key for key, _ in self.store.search("hello", limit=1)], ["b"])
+        self.assertEqual(self.store.search('"; DROP'), [])
+        self.assertEqual(self.store.search("100%"), [])
+    
+    def test_search_short_queries_use_bigram_index(self):
+        self.store.add("a", self._record("Hello World", "你好世界"))
+        self.store.add("b", self._record("Item #1", "项目一"))
+        self.store.add("c", self._record("Goodbye", "再见世人"))
+        self.assertEqual([key for key, _ in self.store.search("世界")], ["a"])
+        self.assertEqual([key for key, _ in self.store.search("世")], ["c", "a"])
+        self.assertEqual([key for key, _ in self.store.search("界")], ["a"])  # 末尾的字符
+        self.assertEqual([key for key, _ in self.store.search("#1")], ["b"])
+        self.assertEqual([key for key, _ in self.store.search("HE")], ["a"])
+        self.assertEqual([key for key, _ in self.store.search("e", limit=2)], ["c", "b"])
+        self.assertEqual(self.store.search("世见"), [])
+        self.store.add("a", self._record("Hello", "你好"))
+        self.assertEqual([key for key, _ in self.store.search("世")], ["c"])
+        self.store.delete("c")
+        self.assertEqual(self.store.search("世"), [])
+    
+    def test_bigram_index_is_built_for_existing_database(self):
+        self.store.add("a", self._record("Hello", "你好"))
+        with self.store._conn:
+            self.store._conn.execute('DROP TABLE history_bigram')
+        self.store.close()
+        self.store = HistoryStore(self.store.db_path)
+        self.assertEqual([key for key, _ in self.store.search("你好")], ["a"])
+    
+    def test_search_filters_language_pair(self):
+        self.store.add("a", self._record("hello", "你好"))
+        self.store.add("b", self._record("hello", "こんにちは", to_lang='日语'))
+        self.assertEqual([key for key, _ in self.store.search("hello", to_lang='日语')], ["b"])
+    
+    def test_publishes_change_events(self):
+        events = []
+        self.store.subscribe(lambda *event: events.append(event))
+        self.store.add("a", self._record("hello", "你好"))
+        self.store.add("a", self._record("hello", "您好"))
+        self.assertTrue(self.store.delete("a"))
+        self.assertFalse(self.store.delete("a"))
+        self.store.clear()
+        self.assertEqual([(action, version, key) for action, version, key, _ in events],
+                         [('add', 1, "a"), ('update', 2, "a"), ('delete', 3, "a"), ('clear', 4, None)])
+        self.assertEqual(events[1][3]['target_text'], "您好")
+
+    def test_clear(self):
+        self.store.add("a", self._record("hello", "你好"))
+        self.store.clear()
+        self.assertEqual(self.store.count(), 0)
+        self.assertEqual(self.store.search("hello"), [])
+
+class TestHistoryPageSource(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(os.path.join(self.temp_dir.name, 'history.db'))
+        self.store.add_many((f"key{i}", {'source_text': f"text{i} " * 20, 'target_text': f"文本{i}",
+                                         'from_lang': '英语', 'to_lang': '中文',
+                                         'time': '2024-01-01 00:00:00'}) for i in range(250))
+        self.source = HistoryPageSource(self.store, preview_length=10)
+    
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+    
+    def test_rows_are_paged_newest_first(self):
+        self.assertEqual(self.source.count(), 250)
+        rows = self.source.rows(95, 105)
+        self.assertEqual([key for key, _ in rows], [f"key{i}" for i in range(154, 144, -1)])
+        self.assertEqual(len(self.source._pages), 2)
+        self.assertEqual(self.source.rows(245, 260)[-1][0], "key0")
+        # 相邻页已缓存时按键定位，不使用OFFSET
+        self.source.invalidate()
+        self.source.rows(100, 110)
+        with patch.object(self.store, 'page', wraps=self.store.page) as page:
+            self.assertEqual(self.source.rows(200, 201)[0][0], "key49")
+            self.assertEqual(self.source.rows(0, 1)[0][0], "key249")
+            self.assertEqual(page.call_args_list[0].kwargs['before_key'], "key50")
+            self.assertEqual(page.call_args_list[1].kwargs['after_key'], "key149")
+    
+    def test_far_jumps_locate_pages_by_id(self):
+        for i in range(0, 250, 7):
+            self.store.delete(f"key{i}")  # 删除后id不连续
+        expected = list(reversed(list(self.store.load())))
+        source = HistoryPageSource(self.store, preview_length=10)
+        source.PAGE_SIZE = 10
+        with patch.object(self.store, 'page', wraps=self.store.page) as page:
+            # 跳到末尾、回到中间、再跳到开头附近，每页都按id读取
+            for start in (200, 205, 90, 15, 120):
+                self.assertEqual([key for key, _ in source.rows(start, start + 3)], expected[start:start + 3])
+            self.assertTrue(all(call.args[0] is None for call in page.call_args_list))
+        with patch.object(self.store, 'locate', wraps=self.store.locate) as locate:
+            source._pages.clear()
+            source.rows(100, 101)
+            # 从已知的第9页页首向后跳过一页，而不是从最新一条记录起跳过100条
+            self.assertEqual(locate.call_args.args, (10, source._page_ids[9]))
+        self.assertEqual(source.rows(len(expected) - 1, len(expected) + 5)[0][0], expected[-1])
+        self.assertEqual(source.rows(len(expected) + 20, len(expected) + 25), [])
+    
+    def test_rows_hold_previews_and_get_returns_full_record(self):
+        key, preview = self.source.rows(0, 1)[0]
+        self.assertEqual(preview['source_text'], "text249 te…")
+        self.assertEqual(preview['target_text'], "文本249")
+        self.assertEqual(self.source.get(key)['source_text'], "text249 " * 20)
+    
+    def test_writes_invalidate_pages(self):
+        self.source.rows(0, 10)
+        self.store.add("new", {'source_text': 'new', 'target_text': '新', 'from_lang': '英语',
+                               'to_lang': '中文', 'time': '2024-01-02 00:00:00'})
+        self.assertEqual(self.source.count(), 251)
+        self.assertEqual(self.source.rows(0, 1)[0][0], "new")
+    
+    def test_apply_adds_rows_without_reading_store(self):
+        events = []
+        self.store.subscribe(lambda *event: events.append(event))
+        self.source.count()
+        self.source.rows(0, 30)
+        self.source.rows(180, 200)
+        self.store.add("new", {'source_text': 'new', 'target_text': '新', 'from_lang': '英语',
+                               'to_lang': '中文', 'time': '2024-01-02 00:00:00'})
+        with patch.object(self.store, 'page') as page, patch.object(self.store, 'count') as count:
+            self.assertEqual(self.source.apply(*events[-1]), 0)
+            self.assertEqual(self.source.count(), 251)
+            self.assertEqual([key for key, _ in self.source.rows(0, 3)], ["new", "key249", "key248"])
+            self.assertEqual(self.source.rows(200, 201)[0][0], "key50")
+            page.assert_not_called()
+            count.assert_not_called()
+        # 之后读取的页从新记录之后开始
+        self.assertEqual(self.source.rows(150, 151)[0][0], "key100")
+        self.source._pages.clear()
+        self.assertEqual(self.source.rows(150, 151)[0][0], "key100")
+    
+    def test_apply_with_missed_event_invalidates(self):
+        events = []
+        self.store.subscribe(lambda *event: events.append(event))
+        self.source.rows(0, 10)
+        for key in ("x", "y"):
+            self.store.add(key, {'source_text': key, 'target_text': key, 'from_lang': '英语',
+                                 'to_lang': '中文', 'time': '2024-01-02 00:00:00'})
+        self.assertIsNone(self.source.apply(*events[-1]))
+        self.assertEqual([key for key, _ in self.source.rows(0, 2)], ["y", "x"])
+        self.store.delete("y")
+        self.assertIsNone(self.source.apply(*events[-1]))
+        self.assertEqual(self.source.count(), 251)
+        self.assertEqual(self.source.rows(0, 1)[0][0], "x")
+
+    def test_list_source(self):
+        source = HistoryListSource(self.store, self.store.search("text1", limit=5), preview_length=10)
+        self.assertEqual(source.count(), 5)
+        key, preview = source.rows(0, 1)[0]
+        self.assertTrue(preview['source_text'].endswith('…'))
+        self.assertEqual(source.get(key)['target_text'], self.store.get(key)['target_text'])
+        self.assertIsNone(source.apply('delete', 1, key))
+        self.assertEqual(source.count(), 4)
+        source.apply('clear', 2)
+        self.assertEqual(source.count(), 0)
+
+class TestHistorySearch(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(os.path.join(self.temp_dir.name, 'history.db'))
+        for i, text in enumerate(["Hello World", "Help me", "Yellow", "hello there"]):
+            self.store.add(f"key{i}", {'source_text': text, 'target_text': '', 'from_lang': '英语',
+                                       'to_lang': '中文', 'time': '2024-01-01 00:00:00'})
+    
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+    
+    def test_longer_query_narrows_previous_results(self):
+        search = HistorySearch(self.store, limit=10)
+        self.assertEqual([key for key, _ in search.search("hel")], ["key3", "key1", "key0"])
+        with patch.object(self.store, 'search') as store_search:
+            self.assertEqual([key for key, _ in search.search("HELLO")], ["key3", "key0"])
+            self.assertEqual([key for key, _ in search.search("hello w")], ["key0"])
+            store_search.assert_not_called()
+    
+    def test_truncated_or_stale_results_query_store(self):
+        search = HistorySearch(self.store, limit=2)
+        self.assertEqual(len(search.search("hel")), 2)
+        self.assertEqual([key for key, _ in search.search("hello")], ["key3", "key0"])
+        self.store.add("key4", {'source_text': 'hello again', 'target_text': '', 'from_lang': '英语',
+                                'to_lang': '中文', 'time': '2024-01-01 00:00:00'})
+        self.assertEqual([key for key, _ in search.search("hello")], ["key4", "key3"])
+    
+    def test_superseded_search_returns_none(self):
+        search = HistorySearch(self.store)
+        generation = search.next_generation()
+        search.next_generation()
+        self.assertIsNone(search.search("hello", generation))
+
 class TestSettingsManager(unittest.TestCase):
     def setUp(self):
         self.temp_dir = tempfile.TemporaryDirectory()
@@ -36,6 +256,7 @@ class TestSettingsManager(unittest.TestCase):
         self.settings_manager = SettingsManager(self.root, self.temp_file)
     
     def tearDown(self):
+        self.settings_manager.history_store.close()
         self.temp_dir.cleanup()
     
     @patch('src.settings_manager.SettingsManager.set_theme')
@@ -61,3 +282,30 @@ class TestSettingsManager(unittest.TestCase):
         self.assertTrue(result)
         loaded_shortcuts = self.settings_manager.load_shortcuts()
         self.assertEqual(loaded_shortcuts, shortcuts)
+
+    def test_append_and_clear_translation_history(self):
+        record = {'source_text': 'hello', 'target_text': '你好', 'from_lang': '英语',
+                  'to_lang': '中文', 'time': '2024-01-01 00:00:00'}
+        self.assertTrue(self.settings_manager.append_translation_history("key", record))
+        self.assertEqual(self.settings_manager.load_translation_history(), {"key": record})
+        self.settings_manager.save_translation_history({})
+        self.assertEqual(self.settings_manager.load_translation_history(), {})
+
+    def test_migrates_legacy_history(self):
+        self.settings_manager.history_store.close()
+        base_path = self.temp_dir.name
+        records = {f"key{i}": {'source_text': f"text{i}", 'target_text': f"文本{i}", 'from_lang': '英语',
+                               'to_lang': '中文', 'time': '2024-01-01 00:00:00'} for i in range(2)}
+        with open(os.path.join(base_path, 'history.json'), 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.remove(os.path.join(base_path, 'history.db'))
+        self.settings_manager = SettingsManager(self.root, self.temp_file)
+        self.assertEqual(self.settings_manager.load_translation_history(), records)
+        self.assertFalse(os.path.exists(os.path.join(base_path, 'history.json')))
+        self.assertTrue(os.path.exists(os.path.join(base_path, 'history.json.migrated')))
+
+    def test_save_and_load_api_tier(self):
+        self.assertEqual(self.settings_manager.load_api_tier(), 'standard')
+        with patch('src.settings_manager.SettingsManager.set_theme'):
+            self.settings_manager.save_all_config("id", "key", {}, "白天", api_tier='advanced')
+        self.assertEqual(self.settings_manager.load_api_tier(), 'advanced')
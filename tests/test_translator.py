@@ -1,7 +1,12 @@
 # tests/test_translator.py
 import unittest
-from unittest.mock import Mock, patch
-from src.translator import BaiduTranslator, TranslationCache, TextPreprocessor
+import os
+import tempfile
+import time
+import threading
+import requests
+from unittest.mock import AsyncMock, Mock, patch
+from src.translator import BaiduTranslator, TranslationCache, TextChunker, AsyncBaiduTranslator, RateLimiter, SingleFlight, RetryPolicy, CircuitBreaker, LocalTranslationServer, BaiduBackend, LatencyTracker, TranslationResult, DiskCache, TranslationMemory, SnapshotCache, TimerWheel
 
 class TestTranslationCache(unittest.TestCase):
     def setUp(self):
@@ -11,21 +16,276 @@ class TestTranslationCache(unittest.TestCase):
         self.cache.set("key1", "value1")
         self.assertEqual(self.cache.get("key1"), "value1")
     
+    def test_auto_key_is_stored_under_detected_language(self):
+        self.cache.set("auto:zh:hello", "你好", detected_lang="en")
+        self.assertEqual(self.cache.get("en:zh:hello"), "你好")
+        self.assertEqual(self.cache.get("auto:zh:hello"), "你好")
+    
     def test_cache_size_limit(self):
         self.cache.set("key1", "value1")
         self.cache.set("key2", "value2")
         self.cache.set("key3", "value3")
         self.assertIsNone(self.cache.get("key1"))
+    
+    def test_get_after_miss_sees_new_value(self):
+        self.assertIsNone(self.cache.get("key1"))
+        self.cache.set("key1", "value1")
+        self.assertEqual(self.cache.get("key1"), "value1")
+    
+    def test_expired_entry_is_not_returned(self):
+        cache = TranslationCache(max_size=2, timeout=0)
+        cache.set("key1", "value1")
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual(cache.stats()['expirations'], 1)
+    
+    def test_stats_snapshot(self):
+        self.cache.set("key1", "value1")
+        self.cache.get("key1")
+        self.cache.get("key2")
+        self.cache.set("key2", "value2")
+        self.cache.set("key3", "value3")
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+    
+    def test_expired_entries_are_purged_without_get(self):
+        cache = TranslationCache(timeout=3600)
+        cache.set("stable", "value1")
+        cache.set("volatile", "value2", ttl=10)
+        cache.set("auto:zh:bonjour", "你好")  # 未检测到源语言的结果较快过期
+        self.assertEqual(cache.expire(now=time.time() + 20), 1)
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertEqual(cache.expire(now=time.time() + 1900), 1)
+        self.assertEqual(cache.stats()['size'], 1)
+        self.assertEqual(cache.stats()['expirations'], 2)
+    
+    def test_overwritten_entry_keeps_new_ttl(self):
+        cache = TranslationCache(timeout=3600)
+        cache.set("key1", "value1", ttl=10)
+        cache.set("key1", "value2", ttl=100)
+        self.assertEqual(cache.expire(now=time.time() + 20), 0)
+        self.assertEqual(cache.get("key1"), "value2")
+    
+    def test_byte_budget_limits_memory(self):
+        cache = TranslationCache(max_bytes=4000)
+        for i in range(20):
+            cache.set(f"key{i}", f"value{i}")
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 4000)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertEqual(cache.get("key19"), "value19")
+        self.assertIsNone(cache.get("key0"))
+    
+    def test_oversized_overwrite_drops_stale_value(self):
+        cache = TranslationCache(max_bytes=4000)
+        cache.set("key1", "value1")
+        cache.set("key1", os.urandom(4000).hex())
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual(cache.stats()['bytes'], 0)
+    
+    def test_sharded_cache_concurrent_access(self):
+        cache = TranslationCache(max_size=20000)
+        self.assertGreater(cache.stats()['shards'], 1)
 
-class TestTextPreprocessor(unittest.TestCase):
-    def test_clean_text(self):
-        text = "Hello|World[]O"
-        cleaned = TextPreprocessor.clean_text(text)
-        self.assertEqual(cleaned, "HelloIWorld00")
+        def worker(worker_id):
+            for i in range(500):
+                cache.set(f"en:zh:{worker_id}-{i}", f"value{worker_id}-{i}")
+                cache.get(f"en:zh:{worker_id}-{i}")
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.stats()
+        self.assertEqual(stats['size'], 4000)
+        self.assertEqual(stats['hits'], 4000)
+        self.assertEqual(cache.get("en:zh:7-499"), "value7-499")
+
+    def test_large_values_are_compressed(self):
+        cache = TranslationCache()
+        document = "这是一段很长的译文。" * 2000
+        cache.set("en:zh:document", document)
+        self.assertEqual(cache.get("en:zh:document"), document)
+        self.assertLess(cache.stats()['bytes'], len(document.encode('utf-8')) // 10)
+    
+    def test_digest_collision_is_a_miss(self):
+        self.cache.set("key1", "value1")
+        with patch.object(TranslationCache, '_digest', return_value=TranslationCache._digest("key1")):
+            self.assertIsNone(self.cache.get("other"))
+    
+    def test_lfu_keeps_frequently_used_entries(self):
+        cache = TranslationCache(max_size=2, policy='lfu')
+        cache.set("key1", "value1")
+        cache.set("key2", "value2")
+        cache.get("key1")
+        cache.set("key3", "value3")
+        self.assertEqual(cache.get("key1"), "value1")
+        self.assertIsNone(cache.get("key2"))
+    
+    def test_tinylfu_resists_scans(self):
+        cache = TranslationCache(max_size=100, policy='tinylfu')
+        for i in range(50):
+            cache.set(f"hot{i}", f"value{i}")
+        for _ in range(3):
+            for i in range(50):
+                cache.get(f"hot{i}")
+        for i in range(1000):
+            cache.set(f"scan{i}", f"value{i}")
+        kept = sum(cache.get(f"hot{i}") is not None for i in range(50))
+        self.assertGreaterEqual(kept, 45)  # LRU下扫描会冲掉全部热点
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'translation_cache.db')
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_entries_survive_restart(self):
+        cache = TranslationCache(disk=DiskCache(self.db_path))
+        cache.set("auto:zh:hello", "你好", detected_lang="en")
+        cache.close()
+        
+        cache = TranslationCache(disk=DiskCache(self.db_path))
+        self.assertEqual(cache.stats()['size'], 1)  # 启动时预热
+        cache.clear()
+        self.assertEqual(cache.get("auto:zh:hello"), "你好")
+        cache.close()
+    
+    def test_deferred_warm_up_keeps_newer_values(self):
+        cache = TranslationCache(disk=DiskCache(self.db_path))
+        cache.set("en:zh:hello", "你好")
+        cache.set("en:zh:bye", "再见")
+        cache.close()
+        
+        cache = TranslationCache(disk=DiskCache(self.db_path), preload=False)
+        self.assertEqual(cache.stats()['size'], 0)
+        cache.set("en:zh:hello", "您好")  # 预热完成前写入的新译文
+        cache.warm_up()
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertEqual(cache.get("en:zh:hello"), "您好")
+        self.assertEqual(cache.get("en:zh:bye"), "再见")
+        cache.close()
+    
+    def test_size_based_eviction(self):
+        disk = DiskCache(self.db_path, max_bytes=200)
+        for i in range(20):
+            disk.put(f"en:zh:key{i}", "x" * 20)
+        disk.flush()
+        self.assertLessEqual(disk._total_size(), 200)
+        self.assertIsNotNone(disk.get("en:zh:key19"))
+        self.assertIsNone(disk.get("en:zh:key0"))
+        disk.close()
+
+class TestSnapshotCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'shared_cache.snap')
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_compaction_shares_entries_between_caches(self):
+        first = TranslationCache(snapshot=SnapshotCache(self.path))
+        second = TranslationCache(snapshot=SnapshotCache(self.path))
+        first.set("en:zh:hello", "你好")
+        first.set("en:zh:document", "很长的译文。" * 500)
+        self.assertTrue(first.compact_snapshot())
+        self.assertFalse(first.compact_snapshot())  # 没有新条目时不重写
+        
+        second._snapshot.refresh()
+        self.assertEqual(second.get("en:zh:hello"), "你好")
+        self.assertEqual(second.get("en:zh:document"), "很长的译文。" * 500)
+        self.assertIsNone(second.get("en:zh:missing"))
+        self.assertEqual(second.stats()['snapshot_hits'], 2)
+        
+        second.set("en:zh:world", "世界")
+        self.assertTrue(second.compact_snapshot())
+        first._snapshot.refresh()
+        self.assertEqual(first.get("en:zh:world"), "世界")
+        self.assertEqual(len(first._snapshot), 3)
+        self.assertEqual(len(first._snapshot._generations()), 1)  # 旧快照已删除
+    
+    def test_compaction_skips_when_locked(self):
+        snapshot = SnapshotCache(self.path)
+        with open(self.path + '.lock', 'w') as f:
+            f.write('1')
+        self.assertFalse(snapshot.compact([("en:zh:hello", "你好")]))
+        self.assertIsNone(snapshot.get("en:zh:hello"))
+
+class TestTranslationMemory(unittest.TestCase):
+    def setUp(self):
+        self.memory = TranslationMemory()
+        self.memory.add("en", "zh", "Please restart the application now.", "请立即重启应用程序。")
+        self.memory.add("en", "zh", "Order 1024 ships in 3 days.", "订单1024将在3天内发货。")
+    
+    def test_whitespace_and_ocr_noise_match(self):
+        match = self.memory.best_match("Please  restart the app1ication now.", "en", "zh", 0.8)
+        self.assertIsNotNone(match)
+        self.assertGreater(match.score, 0.8)
+        self.assertEqual(match.text, "请立即重启应用程序。")
+    
+    def test_changed_numbers_are_substituted(self):
+        match = self.memory.best_match("Order 2048 ships in 5 days.", "auto", "zh", 0.7)
+        self.assertEqual(match.text, "订单2048将在5天内发货。")
+    
+    def test_language_pair_and_threshold(self):
+        self.assertIsNone(self.memory.best_match("Please restart the application now.", "en", "ja", 0.5))
+        self.assertEqual(self.memory.lookup("Something else entirely.", "en", "zh", 0.8), [])
+    
+    def test_translator_offers_fuzzy_match_as_suggestion(self):
+        with patch('src.translator.pyttsx3.init'):
+            translator = BaiduTranslator("test_appid", "test_appkey", memory=self.memory, fuzzy_threshold=0.8)
+        query = "Please restart the application  now"
+        with patch.object(translator, '_call_api') as mock_call_api:
+            result = translator.translate_many_results([query], "en", "zh")[0]
+            streamed = list(translator.translate_stream(query, "en", "zh"))
+        mock_call_api.assert_not_called()
+        self.assertTrue(result.fuzzy)
+        self.assertFalse(result.cache_hit)
+        self.assertEqual(result.text, "请立即重启应用程序。")
+        self.assertTrue(streamed[0].fuzzy)
+        
+        # translate()只返回确切译文，近似译文也不写入缓存
+        with patch.object(translator, '_call_api', return_value=TranslationResult("确切译文", "en")) as mock_call_api:
+            self.assertEqual(translator.translate(query, "en", "zh"), "确切译文")
+        mock_call_api.assert_called_once()
+        translator.close()
+    
+    def test_fuzzy_matching_is_off_by_default(self):
+        with patch('src.translator.pyttsx3.init'):
+            translator = BaiduTranslator("test_appid", "test_appkey", memory=self.memory)
+        with patch.object(translator, '_call_api', return_value=TranslationResult("确切译文", "en")):
+            result = translator.translate_result("Please restart the application  now", "en", "zh")
+        self.assertFalse(result.fuzzy)
+        self.assertEqual(result.text, "确切译文")
+        translator.close()
+
+class TestTimerWheel(unittest.TestCase):
+    def test_items_fire_at_their_deadline_across_levels(self):
+        wheel = TimerWheel(tick=1, now=10)
+        deadlines = [11, 70, 74, 130, 4161, 300000, 20000000]
+        for deadline in deadlines:
+            wheel.schedule(deadline, deadline)
+        fired = {}
+        for now in range(11, 300001):
+            for item in wheel.advance(now):
+                fired[item] = now
+        self.assertEqual(fired, {deadline: deadline for deadline in deadlines[:-1]})
+        self.assertEqual(len(wheel), 1)
+    
+    def test_advance_over_gap(self):
+        wheel = TimerWheel(tick=1, now=0)
+        wheel.schedule(5, 'a')
+        wheel.schedule(5000, 'b')
+        self.assertEqual(wheel.advance(10000), ['a', 'b'])
 
 class TestBaiduTranslator(unittest.TestCase):
     def setUp(self):
-        self.translator = BaiduTranslator("test_appid", "test_appkey")
+        with patch('src.translator.pyttsx3.init'):
+            self.translator = BaiduTranslator("test_appid", "test_appkey")
     
     @patch('requests.Session.get')
     def test_translate_success(self, mock_get):
@@ -37,3 +297,529 @@ class TestBaiduTranslator(unittest.TestCase):
         
         result = self.translator.translate("test", "en", "zh")
         self.assertEqual(result, "测试结果")
+
+class TestBatchTranslation(unittest.TestCase):
+    def setUp(self):
+        with patch('src.translator.pyttsx3.init'):
+            self.translator = BaiduTranslator("test_appid", "test_appkey")
+    
+    @patch('requests.Session.get')
+    def test_translate_many_single_request(self, mock_get):
+        mock_response = Mock()
+        mock_response.json.return_value = {
+            'trans_result': [{'src': 'one', 'dst': '一'}, {'src': 'two', 'dst': '二'}]
+        }
+        mock_get.return_value = mock_response
+        
+        results = self.translator.translate_many(["one", "two", "one"], "en", "zh")
+        self.assertEqual(results, ["一", "二", "一"])
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(mock_get.call_args[1]['params']['q'], "one\ntwo")
+    
+    @patch('requests.Session.get')
+    def test_translate_many_uses_cache(self, mock_get):
+        self.translator.cache.set("en:zh:cached", "缓存")
+        mock_response = Mock()
+        mock_response.json.return_value = {'trans_result': [{'src': 'new', 'dst': '新'}]}
+        mock_get.return_value = mock_response
+        
+        results = self.translator.translate_many(["cached", "new"], "en", "zh")
+        self.assertEqual(results, ["缓存", "新"])
+        self.assertEqual(mock_get.call_args[1]['params']['q'], "new")
+    
+    def test_pack_segments_respects_size_limit(self):
+        self.translator.MAX_QUERY_BYTES = 10
+        batches = self.translator._pack_segments(["aaaa", "bbbb", "cccc", "multi\nline"])
+        self.assertEqual(batches, [["aaaa", "bbbb"], ["multi\nline"], ["cccc"]])
+
+class TestTextChunker(unittest.TestCase):
+    def test_split_at_sentence_boundaries(self):
+        text = "第一句话。第二句话！Third sentence. Pi is 3.14 ok?\n\n第二段。"
+        chunks = TextChunker.split(text, 20)
+        self.assertEqual(''.join(chunk + sep for chunk, sep in chunks), text)
+        self.assertTrue(all(len(chunk.encode('utf-8')) <= 20 for chunk, _ in chunks))
+        self.assertIn(("Third sentence.", " "), chunks)
+    
+    def test_split_long_sentence_by_bytes(self):
+        chunks = TextChunker.split("长" * 10, 9)
+        self.assertEqual([chunk for chunk, _ in chunks], ["长长长", "长长长", "长长长", "长"])
+
+    def test_split_keeps_leading_and_trailing_blank_lines(self):
+        for text in ["\n\nHello", "\n\nHello\n\nWorld\n\n", "  \n第一段。\n\n", "\n\n"]:
+            for merge in (True, False):
+                chunks = TextChunker.split(text, 20, merge=merge)
+                self.assertEqual(''.join(chunk + sep for chunk, sep in chunks), text)
+        self.assertEqual(TextChunker.split("\n\nHello", 20), [("\n\nHello", "")])
+
+class TestChunkedTranslation(unittest.TestCase):
+    def setUp(self):
+        with patch('src.translator.pyttsx3.init'):
+            self.translator = BaiduTranslator("test_appid", "test_appkey")
+        self.translator.MAX_QUERY_BYTES = 20
+    
+    def test_long_text_reassembled_in_order(self):
+        def fake_call_api(query, from_lang, to_lang):
+            lines = query.split('\n')
+            return TranslationResult(query.upper(), 'en', items=[{'dst': line.upper()} for line in lines])
+        self.translator._call_api = fake_call_api
+        
+        text = "first part. second part.\nthird part here."
+        result = self.translator._translate_segments(text, "en", "zh")
+        self.assertTrue(result.ok)
+        self.assertEqual(result.detected_lang, 'en')
+        self.assertEqual(result.text, "FIRST PART. SECOND PART.\nTHIRD PART HERE.")
+
+class TestAsyncBaiduTranslator(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalTranslationServer().start()
+        self.translator = AsyncBaiduTranslator("test_appid", "test_appkey", backend=self.server.backend(),
+                                               qps=1000)
+        self.translator.retry_policy = RetryPolicy(base_delay=0)
+    
+    def tearDown(self):
+        self.translator.close()
+        self.server.stop()
+    
+    def test_translate_many_concurrently(self):
+        segments = [f"line {i}" for i in range(50)]
+        future = self.translator.submit(self.translator.translate_many(segments, "en", "zh"))
+        results = future.result(timeout=10)
+        self.assertEqual(results, [f"[zh]{s}" for s in segments])
+        self.assertEqual(self.translator.cache.get("en:zh:line 3"), "[zh]line 3")
+
+    def test_concurrent_requests_share_rate_limiter(self):
+        limiter = RateLimiter(qps=20, burst=1)
+        translator = AsyncBaiduTranslator("test_appid", "test_appkey", backend=self.server.backend(),
+                                          rate_limiter=limiter)
+        self.addCleanup(translator.close)
+        self.assertIs(translator.rate_limiter, limiter)
+
+        segments = [f"line {i}" for i in range(10)]
+        start = time.monotonic()
+        results = translator.submit(translator.translate_many(segments, "en", "zh")).result(timeout=10)
+        # 首个请求消耗突发令牌，其余9个按20 QPS排队
+        self.assertGreaterEqual(time.monotonic() - start, 0.4)
+        self.assertEqual(results, [f"[zh]{s}" for s in segments])
+
+    def test_retries_transient_error(self):
+        handle = self.server.handle_translate
+        calls = []
+
+        def flaky(params):
+            calls.append(params)
+            if len(calls) == 1:
+                return {'error_code': '52001', 'error_msg': 'TIMEOUT'}
+            return handle(params)
+
+        with patch.object(self.server, 'handle_translate', side_effect=flaky):
+            result = self.translator.submit(self.translator.translate_result("hello", "en", "zh")).result(timeout=10)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.text, "[zh]hello")
+        self.assertEqual(len(calls), 2)
+
+    def test_circuit_breaker_stops_requests(self):
+        self.translator.circuit_breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+        self.server.error_rate = 1
+        result = self.translator.submit(self.translator.translate_result("hello", "en", "zh")).result(timeout=10)
+        self.assertTrue(result.transient)
+        self.assertEqual(self.translator.circuit_breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.server.request_count, 2)
+
+class TestRateLimiter(unittest.TestCase):
+    def test_paces_requests_beyond_burst(self):
+        limiter = RateLimiter(qps=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+    
+    def test_throttle_halves_rate_and_recovers(self):
+        limiter = RateLimiter.for_tier('advanced')
+        limiter.on_throttled()
+        self.assertEqual(limiter.rate, 5)
+        for _ in range(10):
+            limiter.on_success()
+        self.assertEqual(limiter.rate, 10)
+    
+    def test_acquire_timeout(self):
+        limiter = RateLimiter(qps=1, burst=1)
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire(timeout=0.1))
+
+class TestThrottleRetry(unittest.TestCase):
+    @patch('requests.Session.get')
+    def test_throttled_request_is_retried(self, mock_get):
+        with patch('src.translator.pyttsx3.init'):
+            translator = BaiduTranslator("test_appid", "test_appkey", qps=1000)
+        translator.retry_policy = RetryPolicy(base_delay=0)
+        throttled = Mock()
+        throttled.json.return_value = {'error_code': '54003', 'error_msg': 'Invalid Access Limit'}
+        success = Mock()
+        success.json.return_value = {'trans_result': [{'src': 'hi', 'dst': '你好'}]}
+        mock_get.side_effect = [throttled, success]
+        
+        result = translator._call_api("hi", "en", "zh")
+        self.assertTrue(result.ok)
+        self.assertEqual(result.text, '你好')
+        self.assertEqual(mock_get.call_count, 2)
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_are_coalesced(self):
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+        
+        def slow_request():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "结果"
+        
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", slow_request)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.do("key", slow_request)))
+                     for _ in range(4)]
+        for t in followers:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in [leader] + followers:
+            t.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["结果"] * 5)
+    
+    def test_exception_is_shared(self):
+        flight = SingleFlight()
+        future, leader = flight.claim("key")
+        follower, is_leader = flight.claim("key")
+        self.assertTrue(leader)
+        self.assertFalse(is_leader)
+        flight.release("key", exception=ValueError("boom"))
+        self.assertRaises(ValueError, follower.result)
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_classifies_error_codes(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.is_retryable_code('52001'))
+        self.assertTrue(policy.is_retryable_code(52002))
+        self.assertFalse(policy.is_retryable_code('54001'))
+        self.assertFalse(policy.is_retryable_code('52003'))
+    
+    def test_backoff_is_bounded(self):
+        policy = RetryPolicy(base_delay=1, max_delay=4)
+        for attempt in range(10):
+            self.assertLessEqual(policy.backoff(attempt), 4)
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_threshold_and_recovers(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+        
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())  # 半开状态只放行一个试探请求
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+class TestRetryTranslation(unittest.TestCase):
+    def setUp(self):
+        with patch('src.translator.pyttsx3.init'):
+            self.translator = BaiduTranslator("test_appid", "test_appkey", qps=1000)
+        self.translator.retry_policy = RetryPolicy(base_delay=0)
+    
+    @patch('requests.Session.get')
+    def test_transient_error_code_is_retried(self, mock_get):
+        timeout = Mock()
+        timeout.json.return_value = {'error_code': '52001', 'error_msg': 'TIMEOUT'}
+        success = Mock()
+        success.json.return_value = {'trans_result': [{'src': 'hi', 'dst': '你好'}]}
+        mock_get.side_effect = [timeout, success]
+        
+        result = self.translator._call_api("hi", "en", "zh")
+        self.assertEqual(result.text, '你好')
+        self.assertEqual(mock_get.call_count, 2)
+    
+    @patch('requests.Session.get')
+    def test_fatal_error_code_is_not_retried(self, mock_get):
+        response = Mock()
+        response.json.return_value = {'error_code': '54001', 'error_msg': 'Invalid Sign'}
+        mock_get.return_value = response
+        
+        result = self.translator._call_api("hi", "en", "zh")
+        self.assertEqual(result.error_class, TranslationResult.FATAL)
+        self.assertIn('Invalid Sign', result.text)
+        self.assertEqual(mock_get.call_count, 1)
+    
+    @patch('requests.Session.get')
+    def test_open_circuit_fails_fast(self, mock_get):
+        for _ in range(self.translator.circuit_breaker.failure_threshold):
+            self.translator.circuit_breaker.record_failure()
+        
+        result = self.translator._call_api("hi", "en", "zh")
+        self.assertEqual(result.error_class, TranslationResult.TRANSIENT)
+        mock_get.assert_not_called()
+
+    @patch('requests.Session.get')
+    def test_non_retryable_exception_does_not_close_circuit(self, mock_get):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+        self.translator.circuit_breaker = breaker
+        breaker.record_failure()
+        breaker.record_failure()
+        time.sleep(0.06)
+        mock_get.side_effect = ValueError("bad request")
+        
+        result = self.translator._call_api("hi", "en", "zh")
+        self.assertEqual(result.error_class, TranslationResult.FATAL)
+        self.assertEqual(mock_get.call_count, 1)
+        # 未计为成功，熔断器仍处于半开状态，并归还了试探名额
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+    
+    @patch('requests.Session.get')
+    def test_non_retryable_exception_keeps_failure_count(self, mock_get):
+        breaker = self.translator.circuit_breaker
+        for _ in range(breaker.failure_threshold - 1):
+            breaker.record_failure()
+        mock_get.side_effect = ValueError("bad request")
+        
+        self.translator._call_api("hi", "en", "zh")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+class TestHttpStatusHandling(unittest.TestCase):
+    """同一HTTP错误在同步和异步翻译器上应产生相同的限流和熔断状态"""
+    def _sync_state(self, status):
+        with patch('src.translator.pyttsx3.init'):
+            translator = BaiduTranslator("test_appid", "test_appkey", qps=1000)
+        self.addCleanup(translator.close)
+        translator.retry_policy = RetryPolicy(max_attempts=1, base_delay=0)
+        response = requests.Response()
+        response.status_code = status
+        with patch('requests.Session.get', return_value=response):
+            result = translator._call_api("hi", "en", "zh")
+        return self._state(translator, result)
+
+    def _async_state(self, status):
+        translator = AsyncBaiduTranslator("test_appid", "test_appkey", qps=1000)
+        self.addCleanup(translator.close)
+        translator.retry_policy = RetryPolicy(max_attempts=1, base_delay=0)
+        with patch.object(translator._client, 'request', AsyncMock(return_value=(status, b''))):
+            result = translator.submit(translator._call_api("hi", "en", "zh")).result(timeout=10)
+        return self._state(translator, result)
+
+    @staticmethod
+    def _state(translator, result):
+        breaker = translator.circuit_breaker
+        return (result.error_class, translator.rate_limiter.rate, breaker.state,
+                breaker._failures, breaker._trial_in_flight)
+
+    def test_sync_and_async_agree(self):
+        for status in (429, 503, 403):
+            with self.subTest(status=status):
+                self.assertEqual(self._sync_state(status), self._async_state(status))
+        self.assertLess(self._async_state(429)[1], 1000)  # 429降低请求速率
+        self.assertEqual(self._async_state(503)[3], 1)
+        self.assertEqual(self._async_state(403)[0], TranslationResult.FATAL)
+
+class TestNegativeCache(unittest.TestCase):
+    def setUp(self):
+        with patch('src.translator.pyttsx3.init'):
+            self.translator = BaiduTranslator("test_appid", "test_appkey", qps=1000)
+        self.translator.retry_policy = RetryPolicy(max_attempts=1, base_delay=0)
+    
+    def tearDown(self):
+        self.translator.close()
+    
+    @patch('requests.Session.get')
+    def test_transient_error_is_cached_briefly(self, mock_get):
+        response = Mock()
+        response.json.return_value = {'error_code': '52002', 'error_msg': 'SYSTEM ERROR'}
+        mock_get.return_value = response
+        
+        first = self.translator.translate_many_results(["hi"], "en", "zh")[0]
+        second = self.translator.translate_many_results(["hi"], "en", "zh")[0]
+        self.assertEqual(first.error_class, TranslationResult.TRANSIENT)
+        self.assertTrue(second.cache_hit)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIsNone(self.translator.cache.get("en:zh:hi"))
+        
+        self.translator.cache.expire(now=time.time() + 60)
+        self.translator.translate_many_results(["hi"], "en", "zh")
+        self.assertEqual(mock_get.call_count, 2)
+    
+    @patch('requests.Session.get')
+    def test_fatal_error_is_not_cached(self, mock_get):
+        response = Mock()
+        response.json.return_value = {'error_code': '54001', 'error_msg': 'Invalid Sign'}
+        mock_get.return_value = response
+        
+        for _ in range(2):
+            result = self.translator.translate_many_results(["hi"], "en", "zh")[0]
+            self.assertEqual(result.error_class, TranslationResult.FATAL)
+        self.assertEqual(mock_get.call_count, 2)
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        with patch('src.translator.pyttsx3.init'):
+            self.translator = BaiduTranslator("test_appid", "test_appkey", qps=1000)
+    
+    def tearDown(self):
+        self.translator.close()
+    
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    def test_large_query_uses_post(self, mock_get, mock_post):
+        response = Mock()
+        response.json.return_value = {'trans_result': [{'src': 'x', 'dst': 'y'}]}
+        mock_post.return_value = response
+        
+        self.translator._call_api("x" * 3000, "en", "zh")
+        mock_get.assert_not_called()
+        self.assertEqual(mock_post.call_args[1]['data']['q'], "x" * 3000)
+    
+    @patch('requests.Session.head')
+    def test_prewarm_opens_connections(self, mock_head):
+        with patch('src.translator.pyttsx3.init'):
+            translator = BaiduTranslator("test_appid", "test_appkey", prewarm=True)
+        deadline = time.monotonic() + 2
+        while mock_head.call_count < translator.PREWARM_CONNECTIONS and time.monotonic() < deadline:
+            time.sleep(0.01)
+        translator.close()
+        self.assertEqual(mock_head.call_count, translator.PREWARM_CONNECTIONS)
+
+class TestTranslationBackend(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalTranslationServer().start()
+        with patch('src.translator.pyttsx3.init'):
+            self.translator = BaiduTranslator("test_appid", "test_appkey", qps=1000,
+                                              backend=self.server.backend())
+    
+    def tearDown(self):
+        self.translator.close()
+        self.server.stop()
+    
+    def test_translate_through_local_backend(self):
+        self.assertEqual(self.translator.translate("hello", "en", "de"), "[de]hello")
+        result = self.translator.translate_result("hello", "en", "de")
+        self.assertTrue(result.cache_hit)
+        self.assertEqual(self.server.request_count, 1)
+        self.assertFalse(self.translator.translate_result("  ", "en", "de").ok)
+    
+    def test_translate_keeps_surrounding_blank_lines(self):
+        self.assertEqual(self.translator.translate("\n\nhello\n\nworld\n\n", "en", "de"),
+                         "\n\n[de]hello\n\n[de]world\n\n")
+        streamed = ''.join(result.text for result in self.translator.translate_stream("  \nhello  ", "en", "de"))
+        self.assertEqual(streamed, "  \n[de]hello  ")
+    
+    def test_translate_many_through_local_backend(self):
+        results = self.translator.translate_many(["hello", "world"], "auto", "de")
+        self.assertEqual(results, ["[de]hello", "[de]world"])
+        self.assertEqual(self.server.request_count, 1)
+    
+    def test_local_backend_detects_language(self):
+        result = self.translator._call_api("你好", "auto", "en")
+        self.assertTrue(result.ok)
+        self.assertEqual(result.items, [{'src': '你好', 'dst': '[en]你好'}])
+        self.assertEqual(result.detected_lang, 'zh')
+    
+    def test_explicit_language_hits_auto_cache_entry(self):
+        self.translator.translate_many(["bonjour"], "auto", "zh")
+        self.assertEqual(self.translator.translate_many(["bonjour"], "en", "zh"), ["[zh]bonjour"])
+        self.assertEqual(self.server.request_count, 1)
+    
+    def test_baidu_backend_signs_request(self):
+        backend = BaiduBackend("appid", "key")
+        method, url, params = backend.build_request("hi", "en", "zh")
+        self.assertEqual(method, 'GET')
+        self.assertEqual(url, BaiduBackend.API_URL)
+        self.assertEqual(len(params['sign']), 32)
+
+class TestHedgedRequests(unittest.TestCase):
+    def setUp(self):
+        self.slow = Mock()
+        self.slow.send.side_effect = lambda *args: time.sleep(1) or {'trans_result': [{'dst': 'slow'}]}
+        self.fast = Mock()
+        self.fast.send.return_value = {'trans_result': [{'dst': 'fast'}]}
+        with patch('src.translator.pyttsx3.init'):
+            self.translator = BaiduTranslator("test_appid", "test_appkey", qps=1000, backend=self.slow,
+                                              secondary_backend=self.fast, hedge_ratio=1)
+        for _ in range(20):
+            self.translator.latency_tracker.record(0.01)
+    
+    def tearDown(self):
+        self.translator.close()
+    
+    def test_slow_request_is_hedged(self):
+        start = time.monotonic()
+        result = self.translator._send_hedged("hi", "en", "zh")
+        self.assertEqual(result['trans_result'][0]['dst'], 'fast')
+        self.assertLess(time.monotonic() - start, 0.5)
+    
+    def test_hedges_are_capped(self):
+        self.translator.hedge_ratio = 0
+        result = self.translator._send_hedged("hi", "en", "zh")
+        self.assertEqual(result['trans_result'][0]['dst'], 'slow')
+        self.fast.send.assert_not_called()
+
+class TestLatencyTracker(unittest.TestCase):
+    def test_percentile(self):
+        tracker = LatencyTracker(min_samples=10)
+        self.assertIsNone(tracker.percentile(0.9))
+        for i in range(100):
+            tracker.record(i / 100)
+        self.assertAlmostEqual(tracker.percentile(0.95), 0.95)
+
+class TestStreamingTranslation(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalTranslationServer().start()
+        with patch('src.translator.pyttsx3.init'):
+            self.translator = BaiduTranslator("test_appid", "test_appkey", qps=3,
+                                              backend=self.server.backend())
+    
+    def tearDown(self):
+        self.translator.close()
+        self.server.stop()
+    
+    def test_stream_yields_paragraphs_in_order(self):
+        text = "\n\n".join(f"paragraph {i}" for i in range(6))
+        parts = [part.text for part in self.translator.translate_stream(text, "en", "zh")]
+        self.assertEqual(parts[0], "[zh]paragraph 0\n\n")
+        self.assertEqual(''.join(parts), "\n\n".join(f"[zh]paragraph {i}" for i in range(6)))
+        self.assertEqual(self.server.request_count, 4)  # 首段单独请求，其余按3 QPS分为3组
+    
+    def test_edited_text_only_sends_changed_segments(self):
+        text = "\n\n".join(f"paragraph {i}" for i in range(6))
+        list(self.translator.translate_stream(text, "en", "zh"))
+        requests_before = self.server.request_count
+        
+        edited = text.replace("paragraph 3", "paragraph three")
+        parts = [part.text for part in self.translator.translate_stream(edited, "en", "zh")]
+        self.assertEqual(self.server.request_count, requests_before + 1)
+        self.assertEqual(parts[3], "[zh]paragraph three\n\n")
+        self.assertTrue(all(part.cache_hit for part in self.translator.translate_stream(edited, "en", "zh")))
+    
+    def test_concurrent_streams_share_requests(self):
+        self.server.latency = 0.2
+        parts = []
+        def stream():
+            parts.append(''.join(part.text for part in self.translator.translate_stream("hello", "en", "zh")))
+        threads = [threading.Thread(target=stream) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(parts, ["[zh]hello"] * 3)
+        self.assertEqual(self.server.request_count, 1)
+    
+    def test_segment_translation_reuses_cached_paragraphs(self):
+        self.translator._translate_segments("one\ntwo", "en", "zh")
+        result = self.translator._translate_segments("one\n  two\nthree", "en", "zh")
+        self.assertEqual(result.text, "[zh]one\n  [zh]two\n[zh]three")
+        self.assertEqual(self.server.request_count, 2)